@@ -0,0 +1,460 @@
+import asyncio
+import json
+import threading
+import time
+
+from engine import (PipelineEngine, CHUNK_MS, FRAME_BYTES, LLM_MODEL, LLM_PARAMS,
+                    REPLAY_BLOCK_TIMEOUT)
+from stt import backoff_delay, STT_TERMINATE_TIMEOUT
+
+# ------------ ASYNCIO RUNTIME ------------
+# Alternative to the thread-per-stage PipelineEngine: every call is a set of
+# coroutines (STT socket, audio sender, LLM stream, event dispatch) joined by
+# bounded asyncio.Queues, and all calls share one event loop thread plus one
+# AsyncOpenAI client. Stopping cancels tasks instead of waiting out polling
+# timeouts. Select it with "runtime": "asyncio" in config.json.
+AUDIO_QUEUE_FRAMES = 200     # 10s of 50ms frames
+TURN_QUEUE_SIZE = 16
+EVENT_QUEUE_SIZE = 1000
+
+class AsyncRuntime:
+    def __init__(self):
+        self.loop = None
+        self.sessions = []
+        self._thread = None
+        self._llm_client = None
+
+    def start(self):
+        if self.loop is not None:
+            return self.loop
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(ready.set)
+            self.loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='async-runtime', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.loop
+
+    def in_loop(self):
+        return threading.current_thread() is self._thread
+
+    def call(self, coro, timeout=None):
+        # Run a coroutine on the runtime loop from any thread and wait for its result
+        if self.in_loop():
+            return asyncio.ensure_future(coro)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def llm_client(self, config):
+        # One pooled AsyncOpenAI client for every session on this runtime
+        if self._llm_client is None:
+            from llm import get_async_client
+            self._llm_client = get_async_client(config['openai_api_key'], config.get('openai_base_url') or None)
+            self.loop.call_soon_threadsafe(asyncio.ensure_future, self._warm_up(self._llm_client))
+        return self._llm_client
+
+    async def _warm_up(self, client):
+        start = time.perf_counter()
+        try:
+            await client.models.retrieve(LLM_MODEL)
+            print(f"LLM connection warmed in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"LLM warm-up failed: {e}")
+
+    async def _cancel_pending(self):
+        # STT sockets still terminating, their senders, the warm-up: cancelled and
+        # awaited here, so none is left pending when the loop stops
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.loop.shutdown_asyncgens()
+
+    def create_session(self, config=None, **kwargs):
+        self.start()
+        session = AsyncPipelineSession(self, config, **kwargs)
+        self.sessions.append(session)
+        return session
+
+    def shutdown(self):
+        if self.loop is None:
+            return
+        for session in list(self.sessions):
+            session.terminate()
+        try:
+            self.call(self._cancel_pending(), timeout=STT_TERMINATE_TIMEOUT + 1.0)
+        except Exception as e:
+            print(f"Runtime shutdown: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=1.0)
+        self.loop = None
+
+class AsyncPipelineSession(PipelineEngine):
+    def __init__(self, runtime, config=None, device_index=None, audio_interface=None, llm_client=None, audio_source=None):
+        self.runtime = runtime
+        self.ws = None
+        self.audio_aq = None
+        self.turn_q = None
+        self.event_q = None
+        self.audio_overruns = 0
+        self.events_dropped = 0
+        self._unsent = None
+        self._tasks = []
+        self._run_id = 0
+        self._reader = None
+        self._reply_task = None
+        self._dispatcher = None
+        super().__init__(config, device_index, audio_interface=audio_interface, llm_client=llm_client,
+                         audio_source=audio_source)
+
+    def _make_audio_buffer(self):
+        return None  # audio_aq takes the ring buffer's place
+
+    # ---- thread-safe API, same shape as PipelineEngine ----
+    def start(self, capture=True, stt=True):
+        if self.is_running:
+            return False
+        return self.runtime.call(self.astart(capture, stt))
+
+    def stop(self):
+        if not self.is_running:
+            return False
+        return self.runtime.call(self.astop())
+
+    def submit_text(self, text):
+        self._threadsafe(self._enqueue_turn, text, self.tracer.end_of_turn())
+
+    def capture_frame(self, data):
+        # VAD runs on the producer's thread; only the resulting frames cross into the loop
+        frames = self.vad.process(data) if self.vad is not None else [data]
+        if self.vad is None or self.vad.voiced:
+            self.tracer.voice()
+        if frames:
+            self._threadsafe(self._enqueue_audio, frames)
+        if self.vad is not None and self.vad.frames_in % 20 == 0:
+            self._threadsafe(self._report_capture_stats)
+
+    def emit(self, event, *args):
+        if self.event_q is None:
+            PipelineEngine.emit(self, event, *args)
+        else:
+            self._threadsafe(self._enqueue_event, (event, args))
+
+    def _threadsafe(self, fn, *args):
+        if self.runtime.in_loop():
+            fn(*args)
+        else:
+            self.runtime.loop.call_soon_threadsafe(fn, *args)
+
+    def _enqueue_turn(self, text, trace=None):
+        if self.turn_q is not None:
+            try:
+                self.turn_q.put_nowait((text, trace))
+            except asyncio.QueueFull:
+                print(f"Turn queue full, dropping: {text[:40]}")
+                self.emit('turns_settled', 1)
+                return
+            if self.barge_in and self._reply_task is not None:
+                self._reply_task.cancel()  # the customer spoke again: stop the answer in flight
+
+    def _enqueue_audio(self, frames):
+        if self.audio_aq is None:
+            return
+        for frame in frames:
+            if self.audio_aq.full():
+                # Same default as the ring buffer: drop the oldest audio
+                self.audio_aq.get_nowait()
+                self.audio_overruns += 1
+            self.audio_aq.put_nowait(frame)
+
+    def _enqueue_event(self, item):
+        try:
+            self.event_q.put_nowait(item)
+        except asyncio.QueueFull:
+            self.events_dropped += 1
+
+    def _report_capture_stats(self):
+        if self.vad is not None and self.vad.frames_in:
+            self.set_stat('suppressed', f'{self.vad.suppressed_ratio:.0%}')
+        if self.audio_overruns != self.stats.get('overruns'):
+            self.set_stat('overruns', self.audio_overruns)
+        self._report_source_stats()
+
+    # ---- lifecycle ----
+    async def astart(self, capture=True, stt=True):
+        self.is_running = True
+        try:
+            self.audio_aq = asyncio.Queue(maxsize=AUDIO_QUEUE_FRAMES)
+            self.turn_q = asyncio.Queue(maxsize=TURN_QUEUE_SIZE)
+            self.event_q = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+            self._unsent = None
+            if self.config.get('vad_enabled', True):
+                from vad import VoiceActivityDetector
+                self.vad = VoiceActivityDetector(chunk_ms=CHUNK_MS)
+            else:
+                self.vad = None
+            self.reset_history()
+            self.open_cache()
+            self.open_router()
+            self.output.session_id = self.session_id
+            self.output.start()
+            self.open_encoder()
+            from scheduler import get_scheduler
+            self.scheduler = get_scheduler(self.config)
+            if self.llm_client is None:
+                self.runtime.llm_client(self.config)
+            self._run_id += 1
+            self._dispatcher = asyncio.create_task(self._dispatch_events())
+            self._tasks = [
+                asyncio.create_task(self._stt_loop(self._run_id)) if stt else None,
+                asyncio.create_task(self._llm_loop())
+            ]
+            if capture:
+                self._open_stream()
+        except Exception:
+            self._abort_start()
+            raise
+        self.emit('started')
+        return True
+
+    def _abort_start(self):
+        self.is_running = False
+        for task in self._tasks + [self._dispatcher]:
+            if task is not None:
+                task.cancel()
+        self._tasks = []
+        self._close_stream()
+        self.output.stop()
+        self.event_q = None
+
+    async def astop(self):
+        self.is_running = False
+        # Joining the replay thread can take a frame or two; not on the loop thread
+        await asyncio.get_running_loop().run_in_executor(None, self._close_stream)
+        stt_task, llm_task = self._tasks
+        self._tasks = []
+        llm_task.cancel()
+        if self.ws is not None:
+            # Let the server flush the last turn in the background; stop() returns now
+            asyncio.create_task(self._terminate(self.ws, stt_task))
+        elif stt_task is not None:
+            stt_task.cancel()
+        await asyncio.gather(llm_task, return_exceptions=True)
+        if self.cache is not None:
+            self.cache.save()
+        self._report_capture_stats()
+        self.output.stop()
+        self.emit('status', 'offline')
+        self.emit('stopped')
+        await self.event_q.put(None)
+        await self._dispatcher
+        self.event_q = None
+        return True
+
+    async def _terminate(self, ws, stt_task):
+        try:
+            await ws.send(json.dumps({"type": "Terminate"}))
+            # The server closes the socket after its Termination message
+            await asyncio.wait({stt_task}, timeout=STT_TERMINATE_TIMEOUT)
+        except Exception:
+            pass
+        stt_task.cancel()
+
+    def _open_stream(self):
+        # PortAudio's callback thread feeds the loop directly; recorded sources get a reader thread
+        from audio_sources import PyAudioSource
+        self.source = self._make_source()
+        if isinstance(self.source, PyAudioSource):
+            # Always callback-driven here, whatever capture_mode says
+            self.source.open(callback=self.capture_frame)
+            self.source.monitor.on_glitch = self.tracer.glitch
+            return
+        self.source.open()
+        self._reader = threading.Thread(target=self._replay, args=(self.source,), name='audio-replay', daemon=True)
+        self._reader.start()
+
+    def _close_stream(self):
+        reader, self._reader = self._reader, None
+        if reader is not None:
+            reader.join(timeout=1.0)
+        PipelineEngine._close_stream(self)
+
+    def _replay(self, source):
+        try:
+            while self.is_running:
+                data = source.read()
+                if data is None:
+                    if self.is_running:
+                        self.emit('source_ended')
+                    break
+                self.capture_frame(data)
+                if not source.realtime:
+                    # Fast replay waits for the sender instead of overrunning audio_aq
+                    deadline = time.monotonic() + REPLAY_BLOCK_TIMEOUT
+                    while (self.is_running and self.audio_aq is not None
+                           and self.audio_aq.qsize() >= AUDIO_QUEUE_FRAMES // 2 and time.monotonic() < deadline):
+                        time.sleep(0.005)
+        except Exception as e:
+            if self.is_running:
+                self.emit('message', 'error', f"Audio input failed - {e}", True)
+                self.emit('source_ended')
+
+    # ---- coroutines ----
+    async def _dispatch_events(self):
+        while True:
+            item = await self.event_q.get()
+            if item is None:
+                break
+            event, args = item
+            PipelineEngine.emit(self, event, *args)
+
+    async def _stt_loop(self, run_id):
+        from websockets.asyncio.client import connect
+        attempt = 0
+        outage_started = None
+        reconnects = 0
+        while self.is_running and run_id == self._run_id:
+            ws = None
+            try:
+                async with connect(self.stt_endpoint(), additional_headers={"Authorization": self.config['assemblyai_api_key']}) as ws:
+                    self.ws = ws
+                    attempt = 0
+                    if outage_started is not None:
+                        reconnects += 1
+                        self.set_stat('reconnects', reconnects)
+                        self.set_stat('outage', f"{time.monotonic() - outage_started:.1f}s")
+                        outage_started = None
+                    print("WebSocket connection opened.")
+                    self.emit('status', 'online')
+                    sender = asyncio.create_task(self._send_audio(ws))
+                    try:
+                        async for message in ws:
+                            self.on_message(ws, message)
+                    finally:
+                        sender.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.is_running:
+                    self.on_error(None, e)
+            if self.ws is ws:
+                self.ws = None
+            if not self.is_running or run_id != self._run_id:
+                break
+            if outage_started is None:
+                outage_started = time.monotonic()
+            delay = backoff_delay(attempt)
+            attempt += 1
+            print(f"STT connection lost, reconnecting in {delay:.1f}s")
+            self.emit('status', 'reconnecting')
+            await asyncio.sleep(delay)
+
+    async def _send_audio(self, ws):
+        # Coalesce whatever is queued into one message, like PipelineEngine.stream_audio.
+        # A chunk whose send fails is kept in _unsent (already encoded) and replayed on the next connection.
+        self.encoder.reset()
+        while True:
+            if self._unsent is None:
+                parts = [await self.audio_aq.get()]
+                size = len(parts[0])
+                while size + FRAME_BYTES <= self.send_max_bytes and not self.audio_aq.empty():
+                    frame = self.audio_aq.get_nowait()
+                    parts.append(frame)
+                    size += len(frame)
+                self._unsent = self.encoder.encode(b''.join(parts))
+            await ws.send(self._unsent)
+            self.tracer.audio_sent()
+            self.sends += 1
+            self.bytes_sent += len(self._unsent)
+            self._unsent = None
+
+    async def stream_completion_async(self, client, messages):
+        resp = await client.chat.completions.create(messages=messages, stream=True, **LLM_PARAMS)
+        try:
+            async for chunk in resp:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # A barge-in cancels the reply task here; the HTTP stream must not outlive it
+            await resp.close()
+
+    async def _llm_loop(self):
+        client = self.llm_client or self.runtime.llm_client(self.config)
+        while self.is_running:
+            turns = [await self.turn_q.get()]
+            while self.barge_in and not self.turn_q.empty():
+                turns.append(self.turn_q.get_nowait())
+            text, trace = self.merge_turns(turns)
+            if not text:
+                continue
+            trace = self.tracer.request(trace)
+            self.output.begin(trace)
+            try:
+                messages = self.begin_turn(text)
+                context = list(messages)
+                start_time = time.time()
+                timer = self.llm_metrics.start()
+                cached = self.local_reply(text, context)
+
+                # The reply runs as its own task so a barge-in can cancel it,
+                # even while still waiting for the first token
+                reply = {'text': '', 'chunks': [], 'failed': False}
+                task = self._reply_task = asyncio.create_task(
+                    self._stream_reply(client, messages, cached, trace, timer, reply))
+                try:
+                    await asyncio.wait({task})
+                finally:
+                    self._reply_task = None
+                    task.cancel()  # no-op once done; stops the reply if this loop is cancelled
+                if task.cancelled():
+                    self.interrupt_turn(trace, reply['text'], start_time)
+                    continue
+                task.result()
+
+                if cached is None and not reply['failed']:
+                    self.remember_response(text, context, reply['chunks'], time.time() - start_time)
+                self.output.end(reply['text'])
+                self.tracer.finish(trace)
+                self.report_generation(timer)
+                self.finish_turn(reply['text'], start_time)
+                self.report_scheduler()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"GPT error: {e}")
+                self.tracer.finish(trace)
+                self.emit('turns_settled', 1)
+                self.emit('status', 'error')
+
+    async def _stream_reply(self, client, messages, cached, trace, timer, reply):
+        # Fills `reply` as tokens arrive, so a cancelled reply leaves what was shown
+        def take(content):
+            timer.token()
+            if timer.tokens == 1:
+                self.tracer.first_token(trace)
+                self.open_reply()
+            reply['text'] += content
+            reply['chunks'].append(content)
+            self.emit_reply(content)
+
+        if cached is not None:
+            for content in cached:
+                take(content)
+            return
+        tokens = self.scheduler.astream(
+            self.session_id, self.history.total_tokens,
+            lambda: self.stream_completion_async(client, messages),
+            max_tokens=LLM_PARAMS['max_tokens'])
+        try:
+            async for content in tokens:
+                take(content)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            reply['failed'] = True
+            reply['text'] = self.recover_reply(e, reply['text'])
@@ -0,0 +1,338 @@
+import glob
+import os
+import time
+import wave
+from collections import deque
+
+from conditioner import AudioConditioner
+from engine import CHUNK_MS, FRAME_BYTES, FRAME_LEN, RATE, SAMPLE_WIDTH
+from tracing import RollingWindow
+
+# ------------ AUDIO SOURCES ------------
+# Where the engine's capture loop gets its audio: a live PyAudio device, a
+# WAV/raw PCM file, or a directory of recorded calls. Every source yields
+# 16 kHz mono int16 frames of FRAME_BYTES from read(), and None once it is
+# exhausted. Recorded sources are paced in real time by default; with
+# realtime=False they run as fast as the pipeline takes the audio.
+RAW_EXTENSIONS = ('.raw', '.pcm')
+TAIL_SILENCE_MS = 1500  # lets the STT endpoint the last turn of a recording
+MAX_DOWNMIX_CHANNELS = 2  # multi-channel interfaces: mix the first two unless input_channel picks one
+CALLBACK = 'callback'
+BLOCKING = 'blocking'
+PA_INPUT_OVERFLOW = 0x2      # paInputOverflow status flag
+PA_INPUT_OVERFLOWED = -9981  # error code from a blocking read that lost input
+JITTER_WINDOW = 1200         # one minute of 50 ms buffers
+LATE_PERIODS = 2.0           # a buffer this many periods late counts as a glitch
+MIN_DRIFT_SECONDS = 10.0
+
+def native_frame_len(rate):
+    # Input samples per CHUNK_MS at the device's own rate
+    return int(round(rate * CHUNK_MS / 1000))
+
+class AudioSource:
+    realtime = True
+    pushes = False   # True when the source calls back with frames instead of being read
+    monitor = None
+
+    def open(self):
+        pass
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class CaptureMonitor:
+    # Timestamps every device buffer as it arrives. Overflows are input the
+    # device had to throw away because nobody took it in time; jitter is how
+    # far each arrival strays from the nominal buffer period; drift compares
+    # the audio delivered with the wall time it took to arrive.
+    def __init__(self, rate, frames_per_buffer, window=JITTER_WINDOW):
+        self.rate = rate
+        self.period = frames_per_buffer / rate
+        self.jitter = RollingWindow(window)
+        self.on_glitch = None  # callback(kind), e.g. to tag the turn being spoken
+        self.buffers = 0
+        self.overflows = 0
+        self.late = 0
+        self.max_jitter = 0.0
+        self._samples = 0
+        self._first_at = None
+        self._last_at = None
+
+    def record(self, samples, overflowed=False, at=None):
+        now = time.monotonic() if at is None else at
+        if self._last_at is None:
+            self._first_at = now
+        else:
+            # Audio counts toward drift from the end of the first buffer on
+            self._samples += samples
+            deviation = abs(now - self._last_at - self.period)
+            self.jitter.add(deviation)
+            self.max_jitter = max(self.max_jitter, deviation)
+            if deviation > LATE_PERIODS * self.period:
+                self.late += 1
+                self._glitch('late')
+        self._last_at = now
+        self.buffers += 1
+        if overflowed:
+            self.overflows += 1
+            self._glitch('overflow')
+
+    def _glitch(self, kind):
+        if self.on_glitch is not None:
+            self.on_glitch(kind)
+
+    @property
+    def drift_ppm(self):
+        # Positive when the device clock runs fast against time.monotonic()
+        if self._first_at is None:
+            return None
+        elapsed = self._last_at - self._first_at
+        if elapsed < MIN_DRIFT_SECONDS:
+            return None
+        return (self._samples / self.rate - elapsed) / elapsed * 1e6
+
+    def snapshot(self):
+        qs = self.jitter.quantiles()
+        return {
+            'buffers': self.buffers,
+            'overflows': self.overflows,
+            'late': self.late,
+            'jitter_p95_ms': round(qs[0.95] * 1000, 2) if qs else None,
+            'jitter_max_ms': round(self.max_jitter * 1000, 2),
+            'drift_ppm': None if self.drift_ppm is None else round(self.drift_ppm, 1),
+        }
+
+class PyAudioSource(AudioSource):
+    # Opens the device at its native rate and channel count; the conditioner
+    # brings it to 16 kHz mono instead of asking PortAudio for a format many
+    # USB and headset devices don't support.
+    #
+    # In callback mode PortAudio's thread hands each buffer straight to the
+    # consumer (16 kHz mono buffers pass through the conditioner uncopied), so
+    # a busy capture thread can't silently lose input; blocking mode keeps the
+    # old read loop but still counts overflows. Either way every buffer is
+    # timestamped by the monitor.
+    def __init__(self, audio_interface, device_index, channel=None, mode=CALLBACK):
+        if mode not in (CALLBACK, BLOCKING):
+            raise ValueError(f"Unknown capture mode: {mode}")
+        self.pa = audio_interface
+        self.device_index = device_index
+        self.channel = channel
+        self.mode = mode
+        self.pushes = mode == CALLBACK
+        self.stream = None
+        self.rate = RATE
+        self.channels = 1
+        self.frames_per_buffer = FRAME_LEN
+        self.conditioner = None
+        self._ready = deque()
+        self.name = f"device {device_index}"
+
+    def open(self, callback=None):
+        # With a callback, PortAudio's own thread pushes each frame and read() is unused
+        import pyaudio
+        dev = self.pa.get_device_info_by_index(self.device_index)
+        self.rate = int(dev['defaultSampleRate'])
+        if self.channel is not None:
+            self.channels = self.channel + 1
+        else:
+            self.channels = max(1, min(int(dev['maxInputChannels']), MAX_DOWNMIX_CHANNELS))
+        self.frames_per_buffer = native_frame_len(self.rate)
+        self.conditioner = AudioConditioner(self.rate, self.channels, RATE, FRAME_LEN, channel=self.channel)
+        self.monitor = CaptureMonitor(self.rate, self.frames_per_buffer)
+        self._ready.clear()
+        kwargs = {}
+        if callback is not None:
+            monitor = self.monitor
+
+            def stream_callback(in_data, frame_count, time_info, status):
+                monitor.record(frame_count, bool(status & PA_INPUT_OVERFLOW))
+                for frame in self.conditioner.process(in_data):
+                    callback(frame)
+                return (None, pyaudio.paContinue)
+            kwargs['stream_callback'] = stream_callback
+        self.stream = self.pa.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            **kwargs
+        )
+
+    def read(self):
+        while not self._ready:
+            try:
+                data = self.stream.read(self.frames_per_buffer, exception_on_overflow=True)
+            except OSError as e:
+                if e.errno != PA_INPUT_OVERFLOWED:
+                    raise
+                # The buffer that overflowed is gone either way; count it and carry on
+                self.monitor.record(self.frames_per_buffer, overflowed=True)
+                continue
+            self.monitor.record(self.frames_per_buffer)
+            self._ready.extend(self.conditioner.process(data))
+        return self._ready.popleft()
+
+    def close(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            try:
+                stream.stop_stream()
+                stream.close()
+            except Exception:
+                pass
+
+class FileSource(AudioSource):
+    # 16-bit WAV at any rate and channel count (converted to 16 kHz mono), or
+    # headerless 16 kHz mono s16le
+    def __init__(self, path, realtime=True, loop=False, tail_ms=TAIL_SILENCE_MS):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.realtime = realtime
+        self.loop = loop
+        self.tail_frames = int(tail_ms // CHUNK_MS)
+        self._fh = None
+        self._wav = None
+        self.conditioner = None
+        self._native_len = FRAME_LEN
+        self._ready = deque()
+        self._next_at = None
+        self._tail = 0
+        self.frames_read = 0
+
+    def open(self):
+        if self.path.lower().endswith(RAW_EXTENSIONS):
+            self._fh = open(self.path, 'rb')
+        else:
+            self._wav = wave.open(self.path, 'rb')
+            if self._wav.getsampwidth() != SAMPLE_WIDTH:
+                self.close()
+                raise ValueError(f"{self.path}: need {SAMPLE_WIDTH * 8}-bit PCM")
+            rate, channels = self._wav.getframerate(), self._wav.getnchannels()
+            if rate != RATE or channels > 1:
+                self.conditioner = AudioConditioner(rate, channels, RATE, FRAME_LEN)
+                self._native_len = native_frame_len(rate)
+        self._ready.clear()
+        self._next_at = time.monotonic()
+        self._tail = self.tail_frames
+
+    def _read_frame(self):
+        if self._wav is None:
+            data = self._fh.read(FRAME_BYTES)
+        elif self.conditioner is None:
+            data = self._wav.readframes(FRAME_LEN)
+        else:
+            while not self._ready:
+                chunk = self._wav.readframes(self._native_len)
+                if not chunk:
+                    self._ready.extend(self.conditioner.flush())
+                    break
+                self._ready.extend(self.conditioner.process(chunk))
+            data = self._ready.popleft() if self._ready else b''
+        if len(data) < FRAME_BYTES and data:
+            data += bytes(FRAME_BYTES - len(data))  # pad the last partial frame
+        return data
+
+    def _rewind(self):
+        if self.conditioner is not None:
+            self.conditioner.reset()
+            self._ready.clear()
+        if self._wav is not None:
+            self._wav.rewind()
+        else:
+            self._fh.seek(0)
+
+    def read(self):
+        if self._wav is None and self._fh is None:
+            return None  # closed under a reader that was still running
+        data = self._read_frame()
+        if not data and self.loop:
+            self._rewind()
+            data = self._read_frame()
+        if not data:
+            if self._tail <= 0:
+                return None
+            self._tail -= 1
+            data = bytes(FRAME_BYTES)
+        if self.realtime:
+            # Schedule against the start time so sleep jitter doesn't accumulate
+            self._next_at += CHUNK_MS / 1000
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.frames_read += 1
+        return data
+
+    def close(self):
+        for handle in (self._wav, self._fh):
+            if handle is not None:
+                handle.close()
+        self._wav = self._fh = None
+
+class DirectorySource(AudioSource):
+    # Plays every recording in a directory back to back (sorted by name),
+    # separated by the tail silence of each file
+    def __init__(self, path, pattern='*.wav', realtime=True, loop=False):
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path))
+        self.realtime = realtime
+        self.loop = loop
+        self.files = sorted(glob.glob(os.path.join(path, pattern)))
+        if not self.files:
+            raise ValueError(f"No {pattern} files in {path}")
+        self.index = -1
+        self.current = None
+        self._next_at = None
+
+    def open(self):
+        self.index = -1
+        self._next_at = time.monotonic()
+        self._advance()
+
+    def _advance(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        self.index += 1
+        if self.index >= len(self.files):
+            if not self.loop:
+                return False
+            self.index = 0
+        # Pacing is done here so it stays continuous across files
+        self.current = FileSource(self.files[self.index], realtime=False)
+        self.current.open()
+        return True
+
+    def read(self):
+        while self.current is not None:
+            data = self.current.read()
+            if data is not None:
+                if self.realtime:
+                    self._next_at += CHUNK_MS / 1000
+                    delay = self._next_at - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                return data
+            if not self._advance():
+                break
+        return None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+def recorded_source(config):
+    # config 'audio_source' names a file or directory; None means use the live device
+    path = config.get('audio_source')
+    realtime = config.get('audio_realtime', True)
+    if not path:
+        return None
+    if os.path.isdir(path):
+        return DirectorySource(path, pattern=config.get('audio_source_pattern', '*.wav'), realtime=realtime)
+    return FileSource(path, realtime=realtime)
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from casenotes import CaseArchive
+from tracing import quantiles
+
+# ------------ CASE ARCHIVE QUERIES ------------
+# Fills a scratch archive with synthetic case notes spread over the last
+# --days days, then times the supervisor's typical searches against it:
+# keywords alone, keywords plus outcome, and outcome over a date range.
+#
+#   python benchmarks/case_archive.py --notes 20000
+ISSUES = (
+    "iCloud storage full and photos stopped backing up",
+    "Forgot Apple ID password and locked out of the account",
+    "Charged twice for an Apple Music subscription",
+    "iPhone stuck on the Apple logo after the iOS update",
+    "App Store purchases fail with a payment declined message",
+    "Face ID stopped working after a screen replacement",
+    "iPad keeps asking for the Apple ID password",
+    "Family Sharing invite never arrives",
+)
+STEPS = (
+    "Deleted old backups and turned off iCloud Photos for the old iPad.",
+    "Reset the password from iforgot.apple.com and confirmed two-factor codes.",
+    "Checked purchase history and requested a refund for the duplicate charge.",
+    "Force restarted the iPhone and updated it through Finder recovery mode.",
+    "Updated the payment method in Settings and retried the purchase.",
+    "Signed out of iCloud and back in, then restarted the device.",
+)
+OUTCOME_TEXT = ("Resolved", "Escalated to senior advisors", "Transferred to the carrier", "Resolved after restart")
+QUERIES = (
+    {'text': "icloud photos"},
+    {'text': "password", 'outcome': 'resolved'},
+    {'text': "refund subscription"},
+    {'outcome': 'escalated', 'days': 7},
+    {'text': "ios update", 'days': 30},
+)
+
+def fill(archive, notes, days, seed=0):
+    rng = random.Random(seed)
+    now = time.time()
+    for _ in range(notes):
+        archive.add({'issue': rng.choice(ISSUES), 'steps': rng.choice(STEPS), 'outcome': rng.choice(OUTCOME_TEXT)},
+                    session_id=f"call-{rng.randrange(10 ** 6)}", created=now - rng.uniform(0, days * 86400))
+
+def main():
+    parser = argparse.ArgumentParser(description="Search latency of the case-note archive")
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = CaseArchive(os.path.join(tmp, 'cases.db'))
+        started = time.perf_counter()
+        fill(archive, args.notes, args.days)
+        print(json.dumps({'notes': len(archive), 'fts': archive.fts,
+                          'insert_ms_per_note': round(1000 * (time.perf_counter() - started) / args.notes, 3)}))
+        for query in QUERIES:
+            since = None
+            if 'days' in query:
+                since = time.strftime('%Y-%m-%d', time.localtime(time.time() - query['days'] * 86400))
+            timings = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                rows = archive.search(query.get('text'), query.get('outcome'), since)
+                timings.append(time.perf_counter() - t0)
+            qs = quantiles(timings)
+            print(json.dumps({'query': query, 'rows': len(rows),
+                              **{f"p{int(q * 100)}_ms": round(v * 1000, 2) for q, v in qs.items()}}))
+        archive.close()
+
+if __name__ == '__main__':
+    main()
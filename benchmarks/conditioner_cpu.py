@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_sources import native_frame_len
+from conditioner import AudioConditioner
+from engine import FRAME_LEN, RATE, SAMPLE_WIDTH
+
+# ------------ CAPTURE CONDITIONING CPU ------------
+# CPU seconds spent per second of captured audio turning device buffers into
+# 16 kHz mono frames: the NumPy conditioner against the audioop path it
+# replaces (tomono, plus ratecv for devices that aren't 16 kHz). audioop is
+# gone in Python 3.13; its column is skipped there.
+#
+#   python benchmarks/conditioner_cpu.py --seconds 60
+FORMATS = ((16000, 1), (16000, 2), (44100, 2), (48000, 1), (48000, 2))
+
+def device_buffers(rate, channels, seconds):
+    # Speech-band noise at the device's rate, cut into 50 ms device buffers
+    rng = np.random.default_rng(0)
+    n = native_frame_len(rate)
+    samples = (rng.standard_normal((int(rate * seconds), channels)) * 3000).astype('<i2')
+    return [samples[i:i + n].tobytes() for i in range(0, len(samples) - n + 1, n)]
+
+def run_conditioner(buffers, rate, channels):
+    conditioner = AudioConditioner(rate, channels, RATE, FRAME_LEN)
+    frames = 0
+    start = time.process_time()
+    for data in buffers:
+        frames += len(conditioner.process(data))
+    return time.process_time() - start, frames
+
+def run_audioop(buffers, rate, channels):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        import audioop
+    state = None
+    frames = 0
+    start = time.process_time()
+    for data in buffers:
+        if channels > 1:
+            data = audioop.tomono(data, SAMPLE_WIDTH, 0.5, 0.5)
+        if rate != RATE:
+            data, state = audioop.ratecv(data, SAMPLE_WIDTH, 1, rate, RATE, state)
+        frames += len(data) / (FRAME_LEN * SAMPLE_WIDTH)
+    return time.process_time() - start, int(frames)
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU cost of capture conditioning per audio second")
+    parser.add_argument('--seconds', type=float, default=60.0, help="audio per format")
+    args = parser.parse_args()
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            import audioop  # noqa: F401
+        have_audioop = True
+    except ImportError:
+        have_audioop = False
+
+    for rate, channels in FORMATS:
+        buffers = device_buffers(rate, channels, args.seconds)
+        audio_s = len(buffers) * len(buffers[0]) / (rate * channels * SAMPLE_WIDTH)
+        cpu, frames = run_conditioner(buffers, rate, channels)
+        row = {'format': f"{rate} Hz x{channels}", 'frames': frames,
+               'numpy_ms_per_audio_s': round(1000 * cpu / audio_s, 3)}
+        if have_audioop:
+            cpu, _ = run_audioop(buffers, rate, channels)
+            row['audioop_ms_per_audio_s'] = round(1000 * cpu / audio_s, 3)
+        print(json.dumps(row))
+
+if __name__ == '__main__':
+    main()
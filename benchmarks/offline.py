@@ -0,0 +1,190 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_sources import FileSource
+from benchmarks import servers
+from benchmarks.standins import AsyncStandInLLM, StandInLLM, synthetic_frames
+from engine import CHUNK_MS
+from sessions import SessionManager
+from tracing import STAGES, quantiles
+
+# ------------ OFFLINE BENCHMARK ------------
+# Runs real engines (STT socket, on_message, gpt_worker, VAD, ring buffer)
+# against local AssemblyAI and OpenAI stand-ins in a separate process, feeding
+# recorded or synthetic audio in real time. Reports throughput, per-stage
+# latency percentiles, and CPU and memory per session, and compares the
+# result with a saved baseline.
+#
+#   python benchmarks/offline.py --sessions 4 --duration 30 --save-baseline benchmarks/baseline.json
+#   python benchmarks/offline.py --sessions 4 --duration 30 --baseline benchmarks/baseline.json
+COMPARED = {
+    # metric: direction that counts as a regression
+    'stt_p95_ms': 'higher', 'queue_p95_ms': 'higher', 'ttft_p95_ms': 'higher', 'generation_p95_ms': 'higher',
+    'cpu_pct_per_session': 'higher', 'rss_mb_per_session': 'higher', 'turns_per_min': 'lower',
+}
+
+def load_wav(path):
+    # Any 16-bit WAV, converted to 16 kHz mono frames the same way a replayed call is
+    source = FileSource(path, realtime=False, tail_ms=0)
+    try:
+        source.open()
+    except ValueError as e:
+        raise SystemExit(str(e))
+    frames = []
+    try:
+        while True:
+            frame = source.read()
+            if frame is None:
+                break
+            frames.append(frame)
+    finally:
+        source.close()
+    return frames
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def run(args, frames):
+    ctx = mp.get_context('spawn')
+    conn, child_conn = ctx.Pipe()
+    stand_ins = ctx.Process(target=servers.serve, args=(
+        child_conn,
+        {'endpoint_ms': args.endpoint_ms, 'voiced_rms': args.voiced_rms},
+        {'ttft': args.ttft, 'tokens_per_sec': args.tps},
+    ), daemon=True)
+    stand_ins.start()
+    urls = conn.recv()
+
+    config = {
+        'openai_api_key': 'offline', 'assemblyai_api_key': 'offline',
+        'stt_url': urls['stt_url'], 'openai_base_url': urls['llm_url'],
+        'vad_enabled': True, 'response_cache': False, 'case_archive': '', 'runtime': args.runtime,
+        'stt_encoding': args.encoding, 'stt_sample_rate': args.stt_rate,
+    }
+    if args.llm == 'inproc':
+        llm_class = AsyncStandInLLM if args.runtime == 'asyncio' else StandInLLM
+
+        def engine_kwargs():
+            return {'llm_client': llm_class(ttft=args.ttft, tokens_per_sec=args.tps)}
+    else:
+        engine_kwargs = dict
+
+    rss_start = rss_bytes()
+    manager = SessionManager(config, capacity=args.sessions)
+    engines = [manager.open_session(**engine_kwargs()) for _ in range(args.sessions)]
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for engine in engines:
+        engine.start(capture=False)
+
+    stop = threading.Event()
+
+    def feeder():
+        # Every session hears the recording in real time, staggered so turns don't align
+        tick = CHUNK_MS / 1000
+        next_at = time.perf_counter()
+        offsets = [i * len(frames) // len(engines) for i in range(len(engines))]
+        i = 0
+        while not stop.is_set():
+            for engine, offset in zip(engines, offsets):
+                engine.feed_audio(frames[(i + offset) % len(frames)])
+            i += 1
+            next_at += tick
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+
+    thread = threading.Thread(target=feeder, daemon=True)
+    thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    thread.join()
+    time.sleep(args.endpoint_ms / 1000 + args.ttft + 3.0)  # let the last turns finish
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    rss = rss_bytes() - rss_start
+    traces = [t for e in engines for t in e.tracer.completed]
+    bytes_sent = sum(e.bytes_sent for e in engines)
+    manager.shutdown()
+
+    conn.send('stop')
+    server_stats = conn.recv()
+    stand_ins.join(timeout=5.0)
+
+    result = {
+        'sessions': args.sessions,
+        'runtime': args.runtime,
+        'llm': args.llm,
+        'encoding': f"{args.encoding}@{args.stt_rate}",
+        'duration_s': round(wall, 1),
+        'turns': len(traces),
+        'turns_per_min': round(60 * len(traces) / wall, 1),
+        'uplink_kbps_per_session': round(8 * bytes_sent / 1000 / wall / args.sessions, 1),
+        'cpu_pct_per_session': round(100 * cpu / wall / args.sessions, 2),
+        'rss_mb_per_session': round(rss / 2 ** 20 / args.sessions, 2),
+        **server_stats,
+    }
+    for name, _, _ in STAGES:
+        qs = quantiles([s[name] for s in (t.stages() for t in traces) if name in s])
+        for q, value in qs.items():
+            result[f"{name}_p{int(q * 100)}_ms"] = round(value * 1000, 1)
+    return result
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    for metric, worse in COMPARED.items():
+        old, new = baseline.get(metric), result.get(metric)
+        if old is None or new is None or old == 0:
+            continue
+        change = (new - old) / old
+        if (worse == 'higher' and change > tolerance) or (worse == 'lower' and change < -tolerance):
+            regressions.append(f"{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against local vendor stand-ins")
+    parser.add_argument('--sessions', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--audio', help="16-bit WAV to replay, any rate (default: synthetic speech/silence)")
+    parser.add_argument('--runtime', choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument('--llm', choices=['http', 'inproc'], default='http',
+                        help="http: real OpenAI client against the local server; inproc: in-process stand-in")
+    parser.add_argument('--encoding', choices=['pcm_s16le', 'pcm_mulaw'], default='pcm_s16le', help="STT uplink encoding")
+    parser.add_argument('--stt-rate', type=int, choices=[8000, 16000], default=16000, help="STT uplink sample rate")
+    parser.add_argument('--endpoint-ms', type=float, default=500, help="stand-in STT endpointing delay")
+    parser.add_argument('--voiced-rms', type=float, default=500, help="stand-in STT speech threshold")
+    parser.add_argument('--ttft', type=float, default=0.3, help="stand-in LLM time to first token")
+    parser.add_argument('--tps', type=float, default=60.0, help="stand-in LLM tokens per second")
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--baseline', metavar='PATH', help="fail if worse than this baseline by more than --tolerance")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    frames = load_wav(args.audio) if args.audio else synthetic_frames(8)
+    result = run(args, frames)
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as fh:
+            json.dump(result, fh, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(result, json.load(fh), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from benchmarks.standins import DEFAULT_REPLY
+from codec import PCM_MULAW, ulaw_decode
+
+# ------------ LOCAL VENDOR STAND-INS ------------
+# Loopback servers that speak just enough of the AssemblyAI v3 streaming
+# protocol and the OpenAI streaming chat-completions API for the real engine
+# to run against them with no network.
+DEFAULT_UTTERANCES = (
+    "Hi my iCloud storage is full and my photos stopped backing up.",
+    "My name is Jordan Lee and my Apple ID is jordan dot lee at icloud dot com.",
+    "I already deleted some old backups but it still says the storage is full.",
+    "Okay I see Manage Account Storage now what should I tap?",
+    "Thanks that worked the backup is running again.",
+)
+
+class StandInSTTServer:
+    # Begin on connect, unformatted partial Turns while voiced audio arrives,
+    # then end_of_turn (plus a formatted copy when format_turns is set) once
+    # endpoint_ms passes with no voiced audio, and Termination on Terminate.
+    # The gap is measured in wall-clock time or in audio received, whichever
+    # ends first, so faster-than-realtime replay still gets its turns split.
+    def __init__(self, host='127.0.0.1', port=0, endpoint_ms=500, partial_ms=200,
+                 voiced_rms=500.0, utterances=DEFAULT_UTTERANCES):
+        self.host = host
+        self.port = port
+        self.endpoint_ms = endpoint_ms
+        self.partial_ms = partial_ms
+        self.voiced_rms = voiced_rms
+        self.utterances = utterances
+        self.sessions = 0
+        self.turns = 0
+        self.loop = None
+        self._ready = threading.Event()
+        self._stop = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/v3/ws"
+
+    def start(self):
+        threading.Thread(target=self._run, name='stt-standin', daemon=True).start()
+        self._ready.wait(5.0)
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._stop.set)
+
+    def _run(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        from websockets.asyncio.server import serve
+        self.loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        async with serve(self._handle, self.host, self.port, max_size=None) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stop.wait()
+
+    def _voiced(self, data, encoding=None):
+        if encoding == PCM_MULAW:
+            data = ulaw_decode(data)
+        samples = np.frombuffer(data[:len(data) - len(data) % 2], dtype='<i2').astype(np.float32)
+        return samples.size and float(np.sqrt(np.mean(samples * samples))) > self.voiced_rms
+
+    async def _handle(self, ws):
+        query = parse_qs(urlparse(ws.request.path).query)
+        formatted = query.get('format_turns', ['false'])[0].lower() == 'true'
+        encoding = query.get('encoding', ['pcm_s16le'])[0]
+        bytes_per_second = int(query.get('sample_rate', ['16000'])[0]) * (1 if encoding == PCM_MULAW else 2)
+        self.sessions += 1
+        state = {'turn': 0, 'words': 0, 'last_voiced': None, 'voiced_audio': 0.0, 'last_partial': 0.0, 'audio': 0.0}
+        await ws.send(json.dumps({'type': 'Begin', 'id': uuid.uuid4().hex, 'expires_at': int(time.time()) + 3600}))
+
+        def utterance():
+            return self.utterances[state['turn'] % len(self.utterances)]
+
+        def turn_message(text, end_of_turn, is_formatted):
+            return json.dumps({
+                'type': 'Turn', 'turn_order': state['turn'], 'turn_is_formatted': is_formatted,
+                'end_of_turn': end_of_turn, 'end_of_turn_confidence': 0.9 if end_of_turn else 0.1,
+                'transcript': text, 'words': [],
+            })
+
+        async def end_turn():
+            text = utterance()
+            await ws.send(turn_message(text.lower().rstrip('.?!'), True, False))
+            if formatted:
+                await ws.send(turn_message(text, True, True))
+            self.turns += 1
+            state.update(turn=state['turn'] + 1, words=0, last_voiced=None)
+
+        async def endpointer():
+            # Ends the turn endpoint_ms after the last voiced audio
+            while True:
+                await asyncio.sleep(0.02)
+                last = state['last_voiced']
+                if last is None or time.monotonic() - last < self.endpoint_ms / 1000:
+                    continue
+                await end_turn()
+
+        endpointing = asyncio.create_task(endpointer())
+        try:
+            async for message in ws:
+                if isinstance(message, bytes):
+                    state['audio'] += len(message) / bytes_per_second
+                    if not self._voiced(message, encoding):
+                        if (state['last_voiced'] is not None
+                                and state['audio'] - state['voiced_audio'] >= self.endpoint_ms / 1000):
+                            await end_turn()
+                        continue
+                    now = time.monotonic()
+                    state['last_voiced'] = now
+                    state['voiced_audio'] = state['audio']
+                    if now - state['last_partial'] >= self.partial_ms / 1000:
+                        state['last_partial'] = now
+                        words = utterance().lower().rstrip('.?!').split()
+                        state['words'] = min(len(words), state['words'] + 1)
+                        await ws.send(turn_message(" ".join(words[:state['words']]), False, False))
+                elif json.loads(message).get('type') == 'Terminate':
+                    await ws.send(json.dumps({'type': 'Termination', 'audio_duration_seconds': round(state['audio'], 2)}))
+                    break
+        except Exception:
+            pass
+        finally:
+            endpointing.cancel()
+
+class StandInLLMServer:
+    # POST .../chat/completions streams the reply as server-sent events after
+    # ttft seconds at tokens_per_sec; GET .../models/<id> answers warm-ups.
+    def __init__(self, host='127.0.0.1', port=0, ttft=0.3, tokens_per_sec=60.0, reply=DEFAULT_REPLY):
+        self.ttft = ttft
+        self.interval = 1.0 / tokens_per_sec if tokens_per_sec else 0.0
+        self.reply = reply
+        self.requests = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='llm-standin', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, body, status=200):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if '/models/' in self.path:
+                    self._json({'id': self.path.rsplit('/', 1)[-1], 'object': 'model', 'owned_by': 'standin'})
+                else:
+                    self._json({'error': {'message': 'not found'}}, 404)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not self.path.endswith('/chat/completions'):
+                    return self._json({'error': {'message': 'not found'}}, 404)
+                server.requests += 1
+                model = body.get('model', 'standin')
+                if not body.get('stream'):
+                    time.sleep(server.ttft)
+                    return self._json({
+                        'id': 'chatcmpl-standin', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': server.reply}, 'finish_reason': 'stop'}],
+                    })
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                time.sleep(server.ttft)
+                words = server.reply.split(' ')
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(server.interval)
+                    self._event(model, {'content': word if i == len(words) - 1 else word + ' '}, None)
+                self._event(model, {}, 'stop')
+                self._chunk(b'data: [DONE]\n\n')
+                self._chunk(b'')
+
+            def _event(self, model, delta, finish_reason):
+                chunk = {
+                    'id': 'chatcmpl-standin', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                    'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+                }
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+            def _chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+def serve(conn, stt_kwargs, llm_kwargs):
+    # Entry point for running both stand-ins in their own process, so their
+    # CPU time is not billed to the engine under test
+    stt = StandInSTTServer(**stt_kwargs).start()
+    llm = StandInLLMServer(**llm_kwargs).start()
+    conn.send({'stt_url': stt.url, 'llm_url': llm.url})
+    conn.recv()  # any message means stop
+    conn.send({'stt_sessions': stt.sessions, 'stt_turns': stt.turns, 'llm_requests': llm.requests})
+    stt.stop()
+    llm.stop()
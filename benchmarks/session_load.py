@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standins import AsyncStandInLLM, StandInLLM, percentile, synthetic_frames
+from engine import CHUNK_MS
+from sessions import SessionManager
+
+# ------------ MULTI-SESSION LOAD TEST ------------
+# Ramps the number of simultaneous calls on one CPU core and reports where
+# p95 time-to-first-token starts to degrade. Each call gets real-time audio
+# through VAD and the ring buffer plus a customer turn every few seconds,
+# answered by a stand-in LLM with a fixed TTFT and token rate.
+#
+#   python benchmarks/session_load.py --levels 1 2 4 8 16 32 --duration 10
+
+def run_level(sessions, duration, turn_every, ttft, tps, runtime, error_rate=0.0):
+    config = {
+        # A key per level, so each level starts with a fresh LLM scheduler and breaker
+        'openai_api_key': f'load-{sessions}', 'assemblyai_api_key': '',
+        'vad_enabled': True, 'response_cache': False, 'case_archive': '', 'runtime': runtime,
+    }
+    manager = SessionManager(config, capacity=sessions)
+    llm_class = AsyncStandInLLM if runtime == 'asyncio' else StandInLLM
+    engines = [manager.open_session(llm_client=llm_class(ttft=ttft, tokens_per_sec=tps, error_rate=error_rate))
+               for _ in range(sessions)]
+    for engine in engines:
+        engine.start(capture=False, stt=False)
+
+    frames = synthetic_frames(4)
+    stop = threading.Event()
+
+    def feeder():
+        # One thread paces every session's audio at real time
+        tick = CHUNK_MS / 1000
+        next_at = time.perf_counter()
+        i = 0
+        while not stop.is_set():
+            frame = frames[i % len(frames)]
+            for engine in engines:
+                engine.feed_audio(frame)
+                if engine.audio_buf is not None:
+                    engine.audio_buf.read(timeout=0)  # stands in for the STT sender
+            i += 1
+            next_at += tick
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+
+    def talker():
+        # Stagger turns so sessions don't all hit the LLM in the same instant
+        n = 0
+        while not stop.wait(turn_every / sessions):
+            engines[n % sessions].submit_text(f"My iCloud storage is full, question {n}.")
+            n += 1
+
+    threads = [threading.Thread(target=feeder, daemon=True), threading.Thread(target=talker, daemon=True)]
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    time.sleep(ttft + 1.0)  # let in-flight replies finish
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    manager.shutdown()
+
+    ttfts = [s['ttft'] for e in engines for s in e.llm_metrics.recent]
+    return {
+        'sessions': sessions,
+        'turns': len(ttfts),
+        'held': sum(e.stats.get('llm_fallbacks', 0) for e in engines),
+        'ttft_p50_ms': round(percentile(ttfts, 50) * 1000, 1),
+        'ttft_p95_ms': round(percentile(ttfts, 95) * 1000, 1),
+        'cpu_pct': round(100 * cpu / wall, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent session load test")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--turn-every', type=float, default=4.0, help="seconds between turns per session")
+    parser.add_argument('--ttft', type=float, default=0.2, help="stand-in LLM time to first token")
+    parser.add_argument('--tps', type=float, default=50.0, help="stand-in LLM tokens per second")
+    parser.add_argument('--degrade', type=float, default=1.25, help="p95 ratio over the 1-session baseline that counts as degraded")
+    parser.add_argument('--runtime', choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of LLM streams that fail before the first token")
+    parser.add_argument('--core', type=int, default=0, help="CPU core to pin to (-1 to not pin)")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if args.core >= 0 and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {args.core})
+
+    results = []
+    baseline = None
+    sustained = None
+    for level in args.levels:
+        result = run_level(level, args.duration, args.turn_every, args.ttft, args.tps, args.runtime, args.error_rate)
+        if not result['turns']:
+            print(f"{level} sessions completed no turns")
+            break
+        baseline = baseline or result['ttft_p95_ms']
+        result['degraded'] = result['ttft_p95_ms'] > baseline * args.degrade
+        if not result['degraded']:
+            sustained = level
+        results.append(result)
+        if not args.json:
+            print(f"{level:>4} sessions  turns={result['turns']:<5} held={result['held']:<4} p50={result['ttft_p50_ms']:>7}ms "
+                  f"p95={result['ttft_p95_ms']:>7}ms  cpu={result['cpu_pct']:>5}%"
+                  f"{'  DEGRADED' if result['degraded'] else ''}")
+        if result['degraded']:
+            break
+
+    if args.json:
+        print(json.dumps({'results': results, 'max_sustained_sessions': sustained}, indent=2))
+    else:
+        print(f"Max sessions on one core before p95 TTFT degrades {args.degrade}x: {sustained}")
+
+if __name__ == '__main__':
+    main()
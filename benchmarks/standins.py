@@ -0,0 +1,95 @@
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+# ------------ IN-PROCESS STAND-INS ------------
+# Minimal fakes for driving real engines without vendor APIs or a microphone.
+DEFAULT_REPLY = (
+    "I'm sorry to hear your iCloud storage is full. Let's free up some space together. "
+    "Open Settings, tap your name, then tap iCloud and Manage Account Storage."
+)
+
+class StandInStream:
+    def __init__(self, reply, ttft, tokens_per_sec, fail=False):
+        self.reply = reply
+        self.ttft = ttft
+        self.interval = 1.0 / tokens_per_sec if tokens_per_sec else 0.0
+        self.fail = fail
+        self.closed = False
+
+    def __iter__(self):
+        time.sleep(self.ttft)
+        if self.fail:
+            raise ConnectionError("stand-in upstream error")
+        words = self.reply.split(' ')
+        for i, word in enumerate(words):
+            if self.closed:
+                return
+            if i:
+                time.sleep(self.interval)
+            content = word if i == len(words) - 1 else word + ' '
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    def close(self):
+        self.closed = True
+
+class StandInLLM:
+    # Quacks like openai.OpenAI for chat.completions.create(stream=True);
+    # error_rate makes that share of streams fail before their first token
+    def __init__(self, reply=DEFAULT_REPLY, ttft=0.2, tokens_per_sec=50.0, error_rate=0.0, seed=None):
+        self.reply = reply
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages=None, stream=True, **kwargs):
+        self.requests += 1
+        return StandInStream(self.reply, self.ttft, self.tokens_per_sec, self._fails())
+
+    def _fails(self):
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+class AsyncStandInStream(StandInStream):
+    async def __aiter__(self):
+        await asyncio.sleep(self.ttft)
+        if self.fail:
+            raise ConnectionError("stand-in upstream error")
+        words = self.reply.split(' ')
+        for i, word in enumerate(words):
+            if self.closed:
+                return
+            if i:
+                await asyncio.sleep(self.interval)
+            content = word if i == len(words) - 1 else word + ' '
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    async def close(self):
+        self.closed = True
+
+class AsyncStandInLLM(StandInLLM):
+    # Quacks like openai.AsyncOpenAI
+    async def create(self, messages=None, stream=True, **kwargs):
+        self.requests += 1
+        return AsyncStandInStream(self.reply, self.ttft, self.tokens_per_sec, self._fails())
+
+def synthetic_frames(seconds, frame_len=800, rate=16000, seed=0):
+    # Alternating 1.5s of noise-floor "silence" and 2.5s of voiced-level audio, as int16 PCM frames
+    rng = np.random.default_rng(seed)
+    frames = []
+    per_sec = rate // frame_len
+    for i in range(int(seconds * per_sec)):
+        voiced = (i % (4 * per_sec)) >= int(1.5 * per_sec)
+        scale = 3000 if voiced else 40
+        frames.append(rng.normal(0, scale, frame_len).astype('<i2').tobytes())
+    return frames
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return float(np.percentile(np.asarray(values), pct))
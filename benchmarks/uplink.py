@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.offline import load_wav
+from benchmarks.servers import StandInSTTServer
+from benchmarks.standins import synthetic_frames
+from codec import PCM_MULAW, PCM_S16LE, make_encoder, ulaw_decode
+from engine import CHUNK_MS, CONNECTION_PARAMS, RATE, build_endpoint, load_config
+
+# ------------ STT UPLINK BANDWIDTH ------------
+# What each uplink encoding costs and what it gives up: bytes per second on
+# the STT socket, encoder CPU per second of audio, the signal-to-noise ratio
+# of what the STT decodes, and whether the transcript changes. Transcripts
+# come from the local STT stand-in (which only checks that turns split in the
+# same places) or, with --live, from AssemblyAI itself, scored as word error
+# rate against the 16 kHz PCM transcript.
+#
+#   python benchmarks/uplink.py --audio call.wav
+#   python benchmarks/uplink.py --audio call.wav --live
+VARIANTS = (
+    ('pcm16k', PCM_S16LE, 16000),
+    ('mulaw16k', PCM_MULAW, 16000),
+    ('mulaw8k', PCM_MULAW, 8000),
+)
+SEND_FRAMES = 2   # frames per message, like a lightly coalesced live call
+
+def spans(frames):
+    return [b''.join(frames[i:i + SEND_FRAMES]) for i in range(0, len(frames), SEND_FRAMES)]
+
+def encode_all(encoding, sample_rate, chunks):
+    encoder = make_encoder({'stt_encoding': encoding, 'stt_sample_rate': sample_rate}, RATE)
+    start = time.process_time()
+    payloads = [encoder.encode(chunk) for chunk in chunks]
+    return encoder, payloads, time.process_time() - start
+
+def snr_db(encoding, sample_rate, chunks, payloads):
+    # Against the same audio at the same rate, so only the coding loss counts
+    if encoding != PCM_MULAW:
+        return None
+    _, reference, _ = encode_all(PCM_S16LE, sample_rate, chunks)
+    clean = np.frombuffer(b''.join(reference), dtype='<i2').astype(np.float64)
+    coded = np.frombuffer(ulaw_decode(b''.join(payloads)), dtype='<i2').astype(np.float64)
+    noise = np.sum((clean - coded) ** 2)
+    return float('inf') if noise == 0 else 10 * np.log10(np.sum(clean ** 2) / noise)
+
+def transcribe(url, api_key, payloads, seconds_per_payload, realtime):
+    # Final formatted turns from one streaming session
+    import websocket
+    ws = websocket.create_connection(url, header={"Authorization": api_key}, timeout=30)
+    turns = []
+    try:
+        next_at = time.perf_counter()
+        for payload in payloads:
+            ws.send(payload, websocket.ABNF.OPCODE_BINARY)
+            if realtime:
+                next_at += seconds_per_payload
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+        ws.send(json.dumps({"type": "Terminate"}))
+        while True:
+            data = json.loads(ws.recv())
+            if data.get('type') == 'Turn' and data.get('end_of_turn') and data.get('turn_is_formatted'):
+                turns.append(data.get('transcript', ''))
+            elif data.get('type') == 'Termination':
+                break
+    finally:
+        ws.close()
+    return turns
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    row = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, other in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (word != other))
+    return row[-1] / len(ref)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandwidth, CPU and transcript parity of STT uplink encodings")
+    parser.add_argument('--audio', help="16-bit WAV, any rate (default: synthetic speech/silence)")
+    parser.add_argument('--seconds', type=float, default=60.0, help="length of the synthetic audio")
+    parser.add_argument('--live', action='store_true', help="transcribe with AssemblyAI (key from config.json)")
+    args = parser.parse_args()
+
+    frames = load_wav(args.audio) if args.audio else synthetic_frames(args.seconds)
+    chunks = spans(frames)
+    audio_s = len(frames) * CHUNK_MS / 1000
+    if args.live:
+        api_key, base, server = load_config()['assemblyai_api_key'], None, None
+    else:
+        server = StandInSTTServer().start()
+        api_key, base = 'offline', server.url
+
+    reference = None
+    try:
+        for name, encoding, sample_rate in VARIANTS:
+            encoder, payloads, cpu = encode_all(encoding, sample_rate, chunks)
+            url = build_endpoint(dict(CONNECTION_PARAMS, **encoder.params), base=base)
+            turns = transcribe(url, api_key, payloads, SEND_FRAMES * CHUNK_MS / 1000, realtime=args.live)
+            row = {
+                'encoding': name,
+                'bytes_per_s': round(sum(map(len, payloads)) / audio_s),
+                'kbps': round(8 * sum(map(len, payloads)) / 1000 / audio_s, 1),
+                'encode_ms_per_audio_s': round(1000 * cpu / audio_s, 3),
+                'snr_db': snr_db(encoding, sample_rate, chunks, payloads),
+                'turns': len(turns),
+            }
+            if row['snr_db'] is not None:
+                row['snr_db'] = round(row['snr_db'], 1)
+            if reference is None:
+                reference = turns
+            else:
+                row['same_turns'] = len(turns) == len(reference)
+                row['wer_vs_pcm'] = round(word_error_rate(" ".join(reference), " ".join(turns)), 3)
+            print(json.dumps(row))
+    finally:
+        if server is not None:
+            server.stop()
+
+if __name__ == '__main__':
+    main()
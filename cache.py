@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from speculative import normalize_transcript
+
+# ------------ RESPONSE CACHE ------------
+# Repeated support questions ("forgot my Apple ID password") are answered from
+# a local cache instead of a fresh LLM call. Entries are keyed on the
+# normalised transcript plus a hash of the recent conversation, evicted by LRU
+# order, TTL and a size cap, and optionally persisted as JSON. Near-duplicate
+# wording can match through word-shingle Jaccard similarity.
+CACHE_FILE = 'response_cache.json'
+CACHE_TTL = 24 * 3600
+CACHE_SIZE = 500
+CACHE_SIMILARITY = 0.85
+CACHE_SAVE_EVERY = 20
+# The context half of the key is the system prompt plus the last exchange
+# before the turn (TJ's last reply and the customer turn it answered), so a
+# cached reply is only reused where the call got to the same point. Turns
+# under CACHE_MIN_WORDS ("yes", "that worked") mean nothing on their own and
+# are never cached.
+CONTEXT_MESSAGES = 2
+CACHE_MIN_WORDS = 3
+
+def context_key(messages):
+    system = messages[0]['content'] if messages and messages[0]['role'] == 'system' else ''
+    recent = [m for m in messages[:-1] if m['role'] in ('user', 'assistant')][-CONTEXT_MESSAGES:]
+    raw = "\x00".join([system] + [f"{m['role']}:{normalize_transcript(m['content'])}" for m in recent])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+def cacheable(key):
+    return len(key.split()) >= CACHE_MIN_WORDS
+
+def shingles(key, n=2):
+    words = key.split()
+    if len(words) < n:
+        return {key}
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+class ResponseCache:
+    def __init__(self, path=None, max_entries=CACHE_SIZE, ttl=CACHE_TTL, similarity=CACHE_SIMILARITY):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.entries = OrderedDict()  # (context, key) -> entry dict, oldest first
+        self._index = {}              # shingle -> set of (context, key)
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+        if path:
+            self.load()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    # ---- lookup ----
+    def get(self, text, messages):
+        # Returns the cached list of streamed chunks, or None
+        key = normalize_transcript(text)
+        if not cacheable(key):
+            return None
+        ctx = context_key(messages)
+        now = time.time()
+        with self._lock:
+            entry_id = (ctx, key)
+            entry = self.entries.get(entry_id)
+            if entry is None and self.similarity and self.similarity < 1:
+                entry_id = self._similar(ctx, key)
+                entry = self.entries.get(entry_id) if entry_id else None
+            if entry is not None and now - entry['created'] > self.ttl:
+                self._remove(entry_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(entry_id)
+            self.hits += 1
+            self.time_saved += entry['elapsed']
+            return list(entry['chunks'])
+
+    def _similar(self, ctx, key):
+        grams = shingles(key)
+        candidates = set()
+        for gram in grams:
+            candidates.update(self._index.get(gram, ()))
+        best, best_score = None, self.similarity
+        for entry_id in candidates:
+            if entry_id[0] != ctx:
+                continue
+            other = self.entries[entry_id]['shingles']
+            score = len(grams & other) / len(grams | other)
+            if score >= best_score:
+                best, best_score = entry_id, score
+        return best
+
+    # ---- update ----
+    def put(self, text, messages, chunks, elapsed):
+        key = normalize_transcript(text)
+        if not cacheable(key) or not chunks:
+            return
+        entry_id = (context_key(messages), key)
+        with self._lock:
+            if entry_id in self.entries:
+                self._remove(entry_id)
+            self._insert(entry_id, {
+                'chunks': list(chunks),
+                'elapsed': elapsed,
+                'created': time.time(),
+                'shingles': shingles(key),
+            })
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+            self._dirty += 1
+            save = self.path and self._dirty >= CACHE_SAVE_EVERY
+        if save:
+            self.save()
+
+    def _insert(self, entry_id, entry):
+        self.entries[entry_id] = entry
+        for gram in entry['shingles']:
+            self._index.setdefault(gram, set()).add(entry_id)
+
+    def _remove(self, entry_id):
+        entry = self.entries.pop(entry_id)
+        for gram in entry['shingles']:
+            ids = self._index.get(gram)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._index[gram]
+
+    # ---- persistence ----
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for item in data.get('entries', []):
+                if now - item['created'] > self.ttl:
+                    continue
+                key = item['key']
+                self._insert((item['context'], key), {
+                    'chunks': item['chunks'],
+                    'elapsed': item['elapsed'],
+                    'created': item['created'],
+                    'shingles': shingles(key),
+                })
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {'entries': [
+                {'context': ctx, 'key': key, 'chunks': e['chunks'], 'elapsed': e['elapsed'], 'created': e['created']}
+                for (ctx, key), e in self.entries.items()
+            ]}
+            self._dirty = 0
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+_shared = {}
+
+def open_response_cache(config):
+    # One cache per file, shared by every engine in the process
+    if not config.get('response_cache', True):
+        return None
+    path = config.get('response_cache_file', CACHE_FILE) or None
+    if path not in _shared:
+        _shared[path] = ResponseCache(
+            path,
+            max_entries=config.get('response_cache_size', CACHE_SIZE),
+            ttl=config.get('response_cache_ttl', CACHE_TTL),
+            similarity=config.get('response_cache_similarity', CACHE_SIMILARITY)
+        )
+    return _shared[path]
@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from output import OutputSink
+
+# ------------ CASE NOTES ------------
+# Step 8 of the script has TJ close a call with an "Issue / Steps taken /
+# Outcome" note. CaseNoteSink reads the reply segments as they stream out
+# (see output.py), picks up the labelled fields line by line, and files each
+# finished note in a local SQLite archive: one row per note, indexed by
+# outcome and day, with an FTS5 index over the text. A search across thousands
+# of archived calls is then a single indexed query - no transcript is read
+# again.
+#
+#   python casenotes.py "icloud storage" --outcome resolved --since 2026-10-01
+CASE_ARCHIVE = 'case_notes.db'
+SEARCH_LIMIT = 50
+BUSY_TIMEOUT = 5.0   # several worker processes may write the same archive
+
+ISSUE = 'issue'
+STEPS = 'steps'
+OUTCOME = 'outcome'
+OUTCOMES = ('resolved', 'escalated', 'transferred')
+
+# "Issue:", "**Steps taken:**", "- Outcome -" ... at the start of a segment
+_LABEL_RE = re.compile(r"^[\s*_#>-]*(issue|steps?\s+taken|outcome)[\s*_]*[:\-–]\s*[*_]*\s*(.*)$", re.I | re.S)
+_OUTCOME_RE = re.compile(r"\b(resolved|escalated|transferred|referred|unresolved)\b", re.I)
+_FTS_TOKEN_RE = re.compile(r"\w+")
+
+def outcome_kind(text):
+    # The outcome bucket a note is indexed under
+    match = _OUTCOME_RE.search(text or '')
+    if match is None:
+        return 'other'
+    word = match.group(1).lower()
+    return {'referred': 'transferred', 'unresolved': 'escalated'}.get(word, word)
+
+class CaseNoteParser:
+    # Fed one reply segment at a time; a field runs until the next label
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.fields = {}
+        self._current = None
+
+    def feed(self, text):
+        match = _LABEL_RE.match(text)
+        if match is not None:
+            label = match.group(1).lower()
+            self._current = ISSUE if label == 'issue' else OUTCOME if label == 'outcome' else STEPS
+            self.fields[self._current] = match.group(2).strip(" *_")
+        elif self._current is not None:
+            if self._current == OUTCOME and self.fields.get(OUTCOME):
+                self._current = None   # the closing line after the note
+                return
+            self.fields[self._current] = f"{self.fields[self._current]} {text.strip()}".strip()
+
+    def note(self):
+        # The note once it has at least an issue and an outcome, else None
+        if not self.fields.get(ISSUE) or not self.fields.get(OUTCOME):
+            return None
+        return {ISSUE: self.fields[ISSUE], STEPS: self.fields.get(STEPS, ''), OUTCOME: self.fields[OUTCOME]}
+
+class CaseArchive:
+    def __init__(self, path=CASE_ARCHIVE):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self.fts = True
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS cases (
+                id INTEGER PRIMARY KEY, created REAL NOT NULL, day TEXT NOT NULL, session_id TEXT,
+                outcome TEXT NOT NULL, issue TEXT NOT NULL, steps TEXT NOT NULL, outcome_text TEXT NOT NULL)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS cases_outcome_day ON cases (outcome, day)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS cases_day ON cases (day)")
+            try:
+                self._db.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS cases_fts USING fts5(
+                    issue, steps, outcome_text, content='cases', content_rowid='id')""")
+            except sqlite3.OperationalError:
+                self.fts = False   # SQLite built without FTS5: keyword search falls back to LIKE
+
+    def add(self, note, session_id=None, created=None):
+        created = created or time.time()
+        day = time.strftime('%Y-%m-%d', time.localtime(created))
+        row = (created, day, session_id, outcome_kind(note[OUTCOME]), note[ISSUE], note.get(STEPS, ''), note[OUTCOME])
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO cases (created, day, session_id, outcome, issue, steps, outcome_text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            if self.fts:
+                self._db.execute("INSERT INTO cases_fts (rowid, issue, steps, outcome_text) VALUES (?, ?, ?, ?)",
+                                 (cursor.lastrowid, row[4], row[5], row[6]))
+            return cursor.lastrowid
+
+    def search(self, text=None, outcome=None, since=None, until=None, limit=SEARCH_LIMIT):
+        # Matching notes as dicts, best keyword match (else newest) first.
+        # since / until are 'YYYY-MM-DD' days, inclusive.
+        where, args = [], []
+        words = _FTS_TOKEN_RE.findall(text or '')
+        sql, order = "SELECT cases.* FROM cases", "created DESC"
+        if words and self.fts:
+            sql = "SELECT cases.* FROM cases_fts JOIN cases ON cases.id = cases_fts.rowid"
+            where.append("cases_fts MATCH ?")
+            args.append(" ".join(f'"{w}"*' for w in words))
+            order = "bm25(cases_fts), created DESC"
+        for word in words if not self.fts else ():
+            where.append("(issue || ' ' || steps || ' ' || outcome_text) LIKE ?")
+            args.append(f"%{word}%")
+        for clause, value in (("outcome = ?", outcome), ("day >= ?", since), ("day <= ?", until)):
+            if value:
+                where.append(clause)
+                args.append(value)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, args)]
+
+    def counts(self, since=None):
+        # Notes per outcome, for a supervisor summary
+        sql, args = "SELECT outcome, COUNT(*) FROM cases", []
+        if since:
+            sql, args = sql + " WHERE day >= ?", [since]
+        with self._lock:
+            return dict(self._db.execute(sql + " GROUP BY outcome", args).fetchall())
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class CaseNoteSink(OutputSink):
+    # Files the note from a reply once the reply ends. The archive is opened
+    # with the first note, so a call that never closes a case creates no file.
+    def __init__(self, path=CASE_ARCHIVE, on_note=None):
+        self.path = path
+        self.archive = None
+        self.on_note = on_note
+        self.parser = CaseNoteParser()
+        self.reply = None
+
+    def segment(self, segment):
+        if segment.reply != self.reply:
+            self.parser.reset()
+            self.reply = segment.reply
+        self.parser.feed(segment.text)
+
+    def reply_end(self, session_id, reply, text, cut):
+        note = self.parser.note() if reply == self.reply else None
+        self.parser.reset()
+        self.reply = None
+        if note is not None:
+            if self.archive is None:
+                self.archive = open_case_archive(self.path)
+            self.archive.add(note, session_id)
+            if self.on_note is not None:
+                self.on_note(note)
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def open_case_archive(path=CASE_ARCHIVE):
+    # One connection per file, shared by every engine in the process
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = CaseArchive(path)
+        return _shared[path]
+
+def main():
+    parser = argparse.ArgumentParser(description="Search archived case notes")
+    parser.add_argument('text', nargs='?', help="keywords (prefix match on every word)")
+    parser.add_argument('--outcome', choices=OUTCOMES + ('other',))
+    parser.add_argument('--since', help="YYYY-MM-DD")
+    parser.add_argument('--until', help="YYYY-MM-DD")
+    parser.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    parser.add_argument('--archive', default=CASE_ARCHIVE)
+    args = parser.parse_args()
+
+    archive = CaseArchive(args.archive)
+    started = time.perf_counter()
+    rows = archive.search(args.text, args.outcome, args.since, args.until, args.limit)
+    elapsed = time.perf_counter() - started
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+    print(f"{len(rows)} of {len(archive)} notes in {elapsed * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
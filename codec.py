@@ -0,0 +1,103 @@
+import numpy as np
+
+from conditioner import AudioConditioner
+
+# ------------ STT UPLINK ENCODING ------------
+# What goes over the STT socket. Capture, VAD and the ring buffer always work
+# in 16 kHz 16-bit PCM; the encoder runs on each outgoing span just before
+# the send. pcm_s16le at 16 kHz is 256 kbit/s per call; pcm_mulaw is 8 bits a
+# sample (128 kbit/s at 16 kHz, 64 kbit/s at 8 kHz, the telephony rate).
+# Encoding is a single lookup in a 64K-entry table indexed by the raw int16
+# bits, so there is no per-sample Python work.
+PCM_S16LE = 'pcm_s16le'
+PCM_MULAW = 'pcm_mulaw'
+ENCODINGS = (PCM_S16LE, PCM_MULAW)
+SAMPLE_RATES = (8000, 16000)
+MULAW_BIAS = 0x84
+MULAW_CLIP = 8159   # in 14-bit units
+
+_ulaw_table = None
+_ulaw_decode = None
+
+def ulaw_table():
+    # G.711 mu-law code for every int16 value, indexed by its bits as uint16
+    # (the same 14-bit formulation as audioop.lin2ulaw)
+    global _ulaw_table
+    if _ulaw_table is None:
+        x = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+        mask = np.where(x < 0, 0x7F, 0xFF)
+        magnitude = np.minimum(np.abs(x), MULAW_CLIP) + (MULAW_BIAS >> 2)
+        segment = np.maximum(np.floor(np.log2(magnitude)).astype(np.int32) - 5, 0)
+        code = np.where(segment > 7, 0x7F, (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+        _ulaw_table = (code ^ mask).astype(np.uint8)
+    return _ulaw_table
+
+def ulaw_decode_table():
+    # int16 sample for each of the 256 mu-law codes
+    global _ulaw_decode
+    if _ulaw_decode is None:
+        code = ~np.arange(256, dtype=np.int32) & 0xFF
+        exponent = (code >> 4) & 0x07
+        magnitude = ((((code & 0x0F) << 3) + MULAW_BIAS) << exponent) - MULAW_BIAS
+        _ulaw_decode = np.where(code & 0x80, -magnitude, magnitude).astype('<i2')
+    return _ulaw_decode
+
+def ulaw_decode(data):
+    return ulaw_decode_table()[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+class PcmEncoder:
+    encoding = PCM_S16LE
+
+    def __init__(self, sample_rate=16000, in_rate=16000):
+        self.sample_rate = sample_rate
+        self.bytes_per_second = sample_rate * 2
+        self._resampler = None if sample_rate == in_rate else AudioConditioner(in_rate, 1, sample_rate)
+
+    @property
+    def params(self):
+        return {'encoding': self.encoding, 'sample_rate': self.sample_rate}
+
+    def reset(self):
+        if self._resampler is not None:
+            self._resampler.reset()
+
+    def encode(self, span):
+        if self._resampler is None:
+            return bytes(span)
+        return self._resampler.convert(span).astype('<i2').tobytes()
+
+class MuLawEncoder(PcmEncoder):
+    encoding = PCM_MULAW
+
+    def __init__(self, sample_rate=16000, in_rate=16000):
+        super().__init__(sample_rate, in_rate)
+        self.bytes_per_second = sample_rate
+        self.table = ulaw_table()
+        self._codes = np.empty(0, dtype=np.uint8)
+        self._samples = np.empty(0, dtype=np.int16)
+
+    def encode(self, span):
+        if self._resampler is None:
+            index = np.frombuffer(span, dtype='<u2')
+        else:
+            out = self._resampler.convert(span)
+            if len(self._samples) < len(out):
+                self._samples = np.empty(len(out), dtype=np.int16)
+            samples = self._samples[:len(out)]
+            np.copyto(samples, out, casting='unsafe')
+            index = samples.view(np.uint16)
+        if len(self._codes) < len(index):
+            self._codes = np.empty(len(index), dtype=np.uint8)
+        codes = self._codes[:len(index)]
+        np.take(self.table, index, out=codes)
+        return codes.tobytes()
+
+def make_encoder(config, in_rate=16000):
+    encoding = config.get('stt_encoding') or PCM_S16LE
+    sample_rate = int(config.get('stt_sample_rate') or in_rate)
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown STT encoding: {encoding}")
+    if sample_rate not in SAMPLE_RATES:
+        raise ValueError(f"STT sample rate must be one of {SAMPLE_RATES}")
+    cls = MuLawEncoder if encoding == PCM_MULAW else PcmEncoder
+    return cls(sample_rate, in_rate)
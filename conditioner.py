@@ -0,0 +1,137 @@
+from math import gcd
+
+import numpy as np
+
+# ------------ AUDIO CONDITIONER ------------
+# Turns whatever the input device (or recording) natively delivers - any
+# sample rate, any number of interleaved int16 channels - into the 16 kHz mono
+# 50 ms frames the VAD and STT expect. Channels are downmixed (or one is
+# picked) with a single dot product, and the rate is converted with a
+# windowed-sinc polyphase filter whose history and phase carry over from one
+# input buffer to the next, so frame boundaries leave no clicks.
+#
+# Device buffers are a fixed size, so the gather indices and per-output filter
+# rows are computed once per (buffer length, starting phase) and the working
+# arrays are allocated once; steady-state processing allocates only the bytes
+# handed back to the caller.
+TAPS_PER_PHASE = 24
+KAISER_BETA = 8.0
+CUTOFF = 0.9   # fraction of the lower Nyquist frequency kept by the anti-alias filter
+
+def design_filter(up, down, taps_per_phase=TAPS_PER_PHASE, beta=KAISER_BETA, cutoff=CUTOFF):
+    # Lowpass at the upsampled rate, split into `up` phases of taps_per_phase taps each
+    numtaps = up * taps_per_phase
+    fc = cutoff * 0.5 / max(up, down)   # cycles per upsampled sample
+    n = np.arange(numtaps) - (numtaps - 1) / 2
+    h = 2 * fc * np.sinc(2 * fc * n) * np.kaiser(numtaps, beta)
+    h *= up / h.sum()   # unity DC gain after zero-stuffing
+    # phases[p, k] multiplies the input sample k steps back for output phase p
+    return h.reshape(taps_per_phase, up).T.astype(np.float32)
+
+class AudioConditioner:
+    def __init__(self, in_rate, channels=1, out_rate=16000, frame_len=800, channel=None,
+                 taps_per_phase=TAPS_PER_PHASE):
+        if channel is not None and not 0 <= channel < channels:
+            raise ValueError(f"Input channel {channel} out of range for {channels} channels")
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.channels = channels
+        self.frame_len = frame_len
+        g = gcd(self.in_rate, self.out_rate)
+        self.up = self.out_rate // g
+        self.down = self.in_rate // g
+        self.passthrough = self.up == self.down
+        if channel is None:
+            self.weights = np.full(channels, 1.0 / channels, dtype=np.float32)
+        else:
+            self.weights = np.zeros(channels, dtype=np.float32)
+            self.weights[channel] = 1.0
+        self.taps = 1 if self.passthrough else taps_per_phase
+        self.phases = None if self.passthrough else design_filter(self.up, self.down, taps_per_phase)
+        self._plans = {}
+        self._wide = np.zeros((0, channels), dtype=np.float32)
+        self._ext = np.zeros(self.taps - 1, dtype=np.float32)   # filter history + current block
+        # Output is re-cut into exact frame_len frames; a partial frame waits for the next buffer
+        self._pending = np.zeros(frame_len * 2, dtype=np.int16)
+        self._filled = 0
+        self.reset()
+
+    def reset(self):
+        self._ext[:self.taps - 1] = 0.0
+        self._t = 0   # upsampled position of the next output, relative to the current block
+        self._filled = 0
+
+    def _plan(self, n):
+        # Gather indices and filter rows for an n-sample block starting at phase self._t
+        key = (n, self._t)
+        plan = self._plans.get(key)
+        if plan is None:
+            positions = np.arange(self._t, n * self.up, self.down)
+            base, phase = np.divmod(positions, self.up)
+            index = base[:, None] - np.arange(self.taps)[None, :] + (self.taps - 1)
+            rows = self.phases[phase]
+            next_t = self._t + len(positions) * self.down - n * self.up
+            plan = (index, rows, np.empty(rows.shape, dtype=np.float32),
+                    np.empty(len(positions), dtype=np.float32), next_t)
+            if len(self._plans) < 64:
+                self._plans[key] = plan
+        return plan
+
+    def _buffers(self, n):
+        if len(self._wide) < n:
+            self._wide = np.empty((n, self.channels), dtype=np.float32)
+            ext = np.empty(self.taps - 1 + n, dtype=np.float32)
+            ext[:self.taps - 1] = self._ext[:self.taps - 1]
+            self._ext = ext
+        return self._wide[:n], self._ext[:self.taps - 1 + n]
+
+    def process(self, data):
+        # Interleaved int16 bytes in; list of frame_len-sample mono int16 frames out (usually one)
+        if self.passthrough and self.channels == 1 and not self._filled and len(data) == self.frame_len * 2:
+            return [bytes(data)]  # already 16 kHz mono, one frame per buffer
+        out = self.convert(data)
+        return self._frames(out) if len(out) else []
+
+    def convert(self, data):
+        # Interleaved int16 bytes in; float32 mono samples at out_rate, rounded and
+        # clipped to the int16 range. The array is reused by the next call.
+        samples = np.frombuffer(data, dtype='<i2')
+        n = len(samples) // self.channels
+        if n == 0:
+            return self._ext[:0]
+        wide, ext = self._buffers(n)
+        np.copyto(wide, samples[:n * self.channels].reshape(n, self.channels), casting='unsafe')
+        history = self.taps - 1
+        mono = ext[history:]
+        np.dot(wide, self.weights, out=mono)
+        if self.passthrough:
+            out = mono
+        else:
+            index, rows, gathered, out, self._t = self._plan(n)
+            np.take(ext, index, out=gathered)
+            np.einsum('ij,ij->i', gathered, rows, out=out)
+            ext[:history] = ext[n:n + history]
+        np.rint(out, out=out)
+        np.clip(out, -32768, 32767, out=out)
+        return out
+
+    def _frames(self, out):
+        frames = []
+        start = 0
+        while start < len(out):
+            take = min(len(out) - start, self.frame_len - self._filled)
+            np.copyto(self._pending[self._filled:self._filled + take], out[start:start + take], casting='unsafe')
+            self._filled += take
+            start += take
+            if self._filled == self.frame_len:
+                frames.append(self._pending[:self.frame_len].tobytes())
+                self._filled = 0
+        return frames
+
+    def flush(self):
+        # Pads and returns the partial frame left at the end of a recording
+        if not self._filled:
+            return []
+        self._pending[self._filled:self.frame_len] = 0
+        self._filled = 0
+        return [self._pending[:self.frame_len].tobytes()]
@@ -0,0 +1,787 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+from casenotes import CASE_ARCHIVE, CaseNoteSink, outcome_kind
+from history import ConversationHistory
+from llm import LLMMetrics
+from output import OutputStage, SegmentLogSink
+from ringbuffer import BLOCK, AudioRingBuffer
+from stt import STTSession
+from tracing import Tracer, format_quantiles
+
+# Heavy dependencies (pyaudio, websocket, openai, numpy) are imported on first use so
+# the engine can be imported and driven headless without a display or sound card.
+
+# ------------ CONFIG SETUP ------------
+CONFIG_FILE = 'config.json'
+DEFAULT_CONFIG = {
+    "openai_api_key": "",
+    "assemblyai_api_key": "",
+    "device_index": 0,
+    "vad_enabled": True,
+    "audio_buffer_seconds": 10,
+    "audio_overflow_policy": "drop_oldest",
+    "send_min_ms": 50,
+    "send_max_ms": 200,
+    "runtime": "threads",
+    "speculative": False,
+    "speculative_stable_ms": 300,
+    "response_cache": True,
+    "response_cache_file": "response_cache.json",
+    "response_cache_ttl": 86400,
+    "response_cache_size": 500,
+    "response_cache_similarity": 0.85,
+    "history_token_budget": 1500,
+    "workers": 0,
+    "sessions_per_worker": 16,
+    "ui_fps": 30,
+    "transcript_dir": "transcripts",
+    "transcript_window": 200,
+    "transcript_page": 50,
+    "trace_file": "",
+    "metrics_file": "",
+    "stt_url": "",
+    "openai_base_url": "",
+    "audio_source": "",
+    "audio_realtime": True,
+    "input_channel": None,
+    "capture_mode": "callback",
+    "llm_rpm": 500,
+    "llm_tpm": 200000,
+    "llm_max_queue_wait": 8.0,
+    "llm_retries": 3,
+    "llm_breaker_failures": 5,
+    "llm_breaker_cooldown": 30.0,
+    "barge_in": True,
+    "intent_router": True,
+    "output_clauses": True,
+    "output_sink_queue": 64,
+    "segment_log": "",
+    "case_archive": "case_notes.db",
+    "stt_encoding": "pcm_s16le",
+    "stt_sample_rate": 16000
+}
+
+def load_config():
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        with open(CONFIG_FILE, 'w') as f:
+            json.dump(DEFAULT_CONFIG, f, indent=4)
+        return dict(DEFAULT_CONFIG)
+
+def save_config(config):
+    with open(CONFIG_FILE, 'w') as f:
+        json.dump(config, f, indent=4)
+
+# ------------ PIPELINE CONSTANTS ------------
+CONNECTION_PARAMS = {"sample_rate": 16000, "format_turns": True}
+STT_BASE_URL = "wss://streaming.assemblyai.com/v3/ws"
+RATE = 16000
+CHUNK_MS = 50  # Reduced from 100ms to 50ms for faster audio delivery
+FRAME_LEN = int(RATE * CHUNK_MS / 1000)  # 800 samples
+SAMPLE_WIDTH = 2  # paInt16
+FRAME_BYTES = FRAME_LEN * SAMPLE_WIDTH
+STT_MAX_SEND_MS = 1000  # AssemblyAI v3 rejects audio messages longer than this
+CASE_SINK_QUEUE = 256  # a dropped segment can cost a whole case note, so this sink gets more room
+REPLAY_BLOCK_TIMEOUT = 30.0  # how long fast replay waits on a stalled sender before dropping
+
+def ms_to_bytes(ms):
+    # Whole frames only, so coalesced sends never split a capture frame
+    return max(1, int(ms // CHUNK_MS)) * FRAME_BYTES
+LLM_MODEL = "gpt-4o-mini"
+LLM_PARAMS = {"model": LLM_MODEL, "max_tokens": 150, "temperature": 0.5}
+
+def build_endpoint(params=None, base=None):
+    return f"{base or STT_BASE_URL}?{urlencode(params or CONNECTION_PARAMS)}"
+
+API_ENDPOINT = build_endpoint()
+
+SYSTEM_PROMPT = (
+    "Act as a Apple Technical Customer Support Advisor named TJ.\n"
+    "You are a technical expert in Apple inc. You will need to provide solutions and help to issues, query,  troubleshooting and others regarding any apple products. You need to understand every technical issuws apple products have and best solution  to in a way to satisfy the customer. You Must Sound exactly like a human, professional, calm, and empathetic. Stay in character.\n\n"
+    "Follow this chat flows as a expert technical advisor when attending to any Apple customers to ensure they are satisfied:\n"
+    "1. Greet the customer.\n"
+    "2. Ask for their first and last name, then Apple ID email.\n"
+    "3. Ask, “What can I help you with today?”\n"
+    "4. Confirm and restate the issue back to them.\n"
+    "5. Ask clarifying questions if needed.\n"
+    "6. Guide the customers step-by-step (in short, clear instructions). Speak simply for elderly customers.\n"
+    "7. Provide resolution or next steps.\n"
+    "8. Log a short case note in this format:\n"
+    "Issue: [summarize]\n"
+    "Steps taken: [summarize]\n"
+    "Outcome: [resolved/escalated/transferred]\n"
+    "9. Always end each conversation with a polite closing as well trained tech advisor, even if no resolution.\n\n"
+    "Your response be human like and not robotic. Always sound understanding — if a customer is upset or things aren’t going their way, show calm empathy and reassure them that you’ll do all you can within your scope to calm them down and ensure they are happy  you will help them.\n\n"
+    "Only support iOS issues (Apple ID, iCloud, billing, app issues, iPhone/iPad help). If out of scope (e.g., carrier, Mac, or Apple TV), politely refer them to the right support incase or unrelated questions. Note: Stay updated of latest updates from the apple Inc."
+)
+
+def timestamp():
+    return datetime.now().strftime('%H:%M:%S')
+
+# ------------ PIPELINE ENGINE ------------
+# Events sent to subscribers as callback(event, *args):
+#   'status'   (status)                   -> 'online' / 'processing' / 'offline' / 'error'
+#   'message'  (role, text, is_final)     -> role is 'customer', 'assistant' or 'error'
+#   'stat'     (key, value)
+#   'response_complete' (text)
+#   'turns_settled' (count)               -> customer turns that get no reply of their own (merged, dropped, failed)
+#   'started' / 'stopped'
+#   'source_ended'                        -> a recorded audio source has played out (or failed)
+class PipelineEngine:
+    def __init__(self, config=None, device_index=None, audio_interface=None, llm_client=None, audio_source=None):
+        self.config = config if config is not None else load_config()
+        self.device_index = device_index if device_index is not None else self.config.get('device_index')
+        self.llm_client = llm_client
+        self._pa = audio_interface
+        self.is_running = False
+        self.audio_source = audio_source
+        self.source = None
+        self.capture_stats = {}
+        self.scheduler = None
+        self.barge_in = self.config.get('barge_in', True)
+        self.barge_ins = {'cut': 0, 'dropped': 0, 'merged': 0}
+        self.session_id = None
+        self.stt = None
+        self._sender = None
+        self.audio_buf = self._make_audio_buffer()
+        # Adaptive send coalescing window
+        send_min_ms = self.config.get('send_min_ms', 50)
+        send_max_ms = min(max(self.config.get('send_max_ms', 200), send_min_ms), STT_MAX_SEND_MS)
+        self.send_linger = send_min_ms / 1000
+        self.send_min_bytes = ms_to_bytes(send_min_ms)
+        self.send_max_bytes = ms_to_bytes(send_max_ms)
+        self.sends = 0
+        self.bytes_sent = 0
+        self.encoder = None   # built by open_encoder() when a call starts
+        self.stt_q = queue.Queue()
+        self.vad = None
+        self.speculator = None
+        self.cache = None
+        self.router = None
+        self.llm_metrics = LLMMetrics()
+        self.history = ConversationHistory(SYSTEM_PROMPT, budget=self.config.get('history_token_budget', 1500))
+        self.tracer = Tracer(trace_file=self.config.get('trace_file'), metrics_file=self.config.get('metrics_file'))
+        self.tracer.listeners.append(self.report_trace)
+        # Sentence/clause segments of each reply for downstream consumers (TTS, note takers, dashboards)
+        self.output = OutputStage(self.tracer, clauses=self.config.get('output_clauses', True),
+                                  queue_size=self.config.get('output_sink_queue', 64))
+        if self.config.get('segment_log'):
+            self.output.add_sink(SegmentLogSink(self.config['segment_log']))
+        # Case notes from TJ's replies, filed in a searchable archive shared by every call
+        self.case_notes = 0
+        case_archive = self.config.get('case_archive', CASE_ARCHIVE)
+        if case_archive:
+            self.output.add_sink(CaseNoteSink(case_archive, on_note=self.report_case_note), maxsize=CASE_SINK_QUEUE)
+        self.stats = {'responses': 0, 'latency': None, 'suppressed': None}
+        self._subscribers = []
+        self._threads = []
+
+    def _make_audio_buffer(self):
+        # Bounded capture -> sender buffer; a stalled socket costs at most this much memory
+        return AudioRingBuffer(
+            int(self.config.get('audio_buffer_seconds', 10) * RATE) * SAMPLE_WIDTH,
+            policy=self.config.get('audio_overflow_policy', 'drop_oldest'),
+            align=FRAME_BYTES
+        )
+
+    # ---- event bus ----
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def emit(self, event, *args):
+        for callback in list(self._subscribers):
+            try:
+                callback(event, *args)
+            except Exception as e:
+                print(f"Subscriber error ({event}): {e}")
+
+    def set_stat(self, key, value):
+        self.stats[key] = value
+        self.emit('stat', key, value)
+
+    # ---- lifecycle ----
+    @property
+    def audio_interface(self):
+        if self._pa is None:
+            import pyaudio
+            self._pa = pyaudio.PyAudio()
+        return self._pa
+
+    def start(self, capture=True, stt=True):
+        # capture=False / stt=False run the pipeline without a device or STT socket;
+        # audio and turns can then be fed with feed_audio() and submit_text()
+        if self.is_running:
+            return False
+        self.is_running = True
+        try:
+            self.audio_buf.clear()
+            self._drain(self.stt_q)
+            self._threads = []
+            if self.config.get('vad_enabled', True):
+                from vad import VoiceActivityDetector
+                self.vad = VoiceActivityDetector(chunk_ms=CHUNK_MS)
+            else:
+                self.vad = None
+            self.open_encoder()
+            from scheduler import get_scheduler
+            self.scheduler = get_scheduler(self.config)
+            if self.config.get('speculative', False):
+                from speculative import Speculator
+                self.speculator = Speculator(
+                    self,
+                    lambda messages, cancelled: self.scheduled_completion(self._get_llm_client(), messages, cancelled),
+                    stable_ms=self.config.get('speculative_stable_ms', 300)
+                )
+            else:
+                self.speculator = None
+            self.open_cache()
+            self.open_router()
+            if self.llm_client is None:
+                # Pre-connect the shared client while the customer is still being greeted
+                from llm import warm_up
+                warm_up(self._get_llm_client(), LLM_MODEL)
+            if capture:
+                self._open_stream()
+            self.output.session_id = self.session_id
+            self.output.start()
+            self._spawn(self.gpt_worker)
+            if stt:
+                self.run_stt()
+        except Exception:
+            self._abort_start()
+            raise
+        self.emit('started')
+        return True
+
+    def _abort_start(self):
+        # Undo a start() that raised part way, so the engine can be started again
+        self.is_running = False
+        self.audio_buf.close()
+        if self.stt is not None:
+            self.stt.stop()
+        self._close_stream()
+        self.output.stop()
+
+    def stop(self):
+        if not self.is_running:
+            return False
+        self.is_running = False
+        self.audio_buf.close()
+        if self.stt is not None:
+            self.stt.stop()  # Terminates and closes in the background
+        if self.speculator is not None:
+            self.speculator.cancel()
+        if self.cache is not None:
+            self.cache.save()
+        self._close_stream()
+        self._report_capture_stats()
+        self.output.stop()
+        self.emit('stopped')
+        return True
+
+    def terminate(self):
+        self.stop()
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+
+    def add_sink(self, sink, maxsize=None):
+        # sink.segment(segment) / sink.reply_end(...) are called on the sink's own thread
+        return self.output.add_sink(sink, maxsize)
+
+    def remove_sink(self, sink):
+        self.output.remove_sink(sink)
+
+    def submit_text(self, text):
+        # Inject a final customer turn directly (tests, text-only channels)
+        self.stt_q.put((text, self.tracer.end_of_turn()))
+
+    def feed_audio(self, data):
+        # Inject captured PCM when audio comes from somewhere other than the device
+        if data:
+            self.capture_frame(data)
+
+    def _spawn(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return thread
+
+    @staticmethod
+    def _drain(q):
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+
+    # ------------ AUDIO CAPTURE ------------
+    def _make_source(self):
+        # An injected source, else config 'audio_source', else the selected input device
+        from audio_sources import PyAudioSource, recorded_source
+        if self.audio_source is not None:
+            return self.audio_source
+        return recorded_source(self.config) or PyAudioSource(
+            self.audio_interface, self.device_index, channel=self.config.get('input_channel'),
+            mode=self.config.get('capture_mode', 'callback'))
+
+    def _open_stream(self):
+        # Callback sources push frames from their own thread; anything else gets a reader thread
+        self.source = self._make_source()
+        if self.source.pushes:
+            self.source.open(callback=self.capture_frame)
+        else:
+            self.source.open()
+            self._spawn(self.read_audio)
+        if self.source.monitor is not None:
+            self.source.monitor.on_glitch = self.tracer.glitch
+        # Faster-than-realtime replay must wait for the sender instead of dropping audio
+        if self.source.realtime:
+            self.audio_buf.policy = self.config.get('audio_overflow_policy', 'drop_oldest')
+            self.audio_buf.block_timeout = 0.5
+        else:
+            self.audio_buf.policy = BLOCK
+            self.audio_buf.block_timeout = REPLAY_BLOCK_TIMEOUT
+
+    def _close_stream(self):
+        self._report_source_stats()
+        source, self.source = self.source, None
+        if source is not None:
+            source.close()
+
+    def read_audio(self):
+        try:
+            while self.is_running:
+                data = self.source.read()
+                if data is None:
+                    if self.is_running:
+                        self.emit('source_ended')
+                    break
+                if len(data) == 0:
+                    continue
+                self.capture_frame(data)
+        except Exception as e:
+            if self.is_running:
+                self.emit('message', 'error', f"Audio input failed - {e}", True)
+                self.emit('source_ended')   # nothing more is coming; replay stops waiting for it
+            self.audio_buf.close()
+
+    def capture_frame(self, data):
+        # Gate frames through the VAD so only voiced audio (plus keepalives) reaches the socket
+        vad = self.vad
+        if vad is None:
+            self.tracer.voice()
+            self.audio_buf.write(data)
+            return
+        for frame in vad.process(data):
+            self.audio_buf.write(frame)
+        if vad.voiced:
+            self.tracer.voice()
+        if vad.frames_in % 20 == 0:  # about once a second
+            self._report_capture_stats()
+
+    def _report_capture_stats(self):
+        if self.vad is not None and self.vad.frames_in:
+            self.set_stat('suppressed', f'{self.vad.suppressed_ratio:.0%}')
+        if self.audio_buf.overruns != self.stats.get('overruns'):
+            self.set_stat('overruns', self.audio_buf.overruns)
+        self._report_source_stats()
+
+    def _report_source_stats(self):
+        source = self.source
+        if source is None or source.monitor is None:
+            return
+        capture = source.monitor.snapshot()
+        self.capture_stats = capture
+        values = {
+            'capture_glitches': capture['overflows'] + capture['late'],
+            'capture_jitter': None if capture['jitter_p95_ms'] is None else f"{capture['jitter_p95_ms']:.1f}ms p95",
+            'clock_drift': None if capture['drift_ppm'] is None else f"{capture['drift_ppm']:+.0f}ppm",
+        }
+        for key, value in values.items():
+            if value is not None and value != self.stats.get(key):
+                self.set_stat(key, value)
+
+    # ------------ STT HANDLER ------------
+    def run_stt(self):
+        # A fresh session per start, so Start after Stop never reuses a closed socket
+        self.stt = STTSession(
+            self.stt_endpoint(),
+            self.config['assemblyai_api_key'],
+            on_open=self.on_open,
+            on_message=self.on_message,
+            on_error=self.on_error,
+            on_state=self.on_stt_state
+        )
+        self.stt.start()
+
+    def open_encoder(self):
+        # codec pulls in numpy, so like the VAD it is imported when a call starts
+        from codec import make_encoder
+        self.encoder = make_encoder(self.config, RATE)
+
+    def stt_endpoint(self):
+        # stt_url points the call at another AssemblyAI-compatible server (e.g. the offline benchmark);
+        # encoding and sample_rate tell the STT what the uplink encoder sends
+        return build_endpoint(dict(CONNECTION_PARAMS, **self.encoder.params), base=self.config.get('stt_url') or None)
+
+    def on_open(self, ws):
+        print("WebSocket connection opened.")
+        self.emit('status', 'online')
+        previous = self._sender
+        self._sender = threading.Thread(target=self.stream_audio, args=(ws, previous), daemon=True)
+        self._sender.start()
+
+    def stream_audio(self, ws, previous=None):
+        import websocket
+        if previous is not None:
+            # Only one sender may hold spans of the ring buffer at a time
+            previous.join()
+        buf = self.audio_buf
+        self.encoder.reset()
+        while self.is_running and self.stt is not None and self.stt.ws is ws:
+            # Pack everything queued (up to send_max_ms) into one message. When the
+            # buffer is nearly empty this degrades to single frames, and after a
+            # stall the backlog drains in a few max-sized sends.
+            span = buf.peek(self.send_max_bytes, min_bytes=self.send_min_bytes, timeout=self.send_linger)
+            if span is None:
+                span = buf.peek(self.send_max_bytes, timeout=1.0)
+            if span is None:
+                continue
+            sent = len(span)
+            try:
+                # websocket-client masks client frames into a fresh buffer, so
+                # with 16 kHz PCM this is the only copy between capture and the socket
+                payload = self.encoder.encode(span)
+                ws.send(payload, websocket.ABNF.OPCODE_BINARY)
+            except Exception:
+                # Closed or failed socket: the span stays buffered for the next connection
+                buf.release()
+                break
+            buf.consume(sent)
+            self.tracer.audio_sent()
+            self.sends += 1
+            self.bytes_sent += len(payload)
+
+    def on_message(self, ws, message):
+        try:
+            data = json.loads(message)
+            if data.get('type') == "Begin":
+                session_id = data.get('id')
+                expires_at = data.get('expires_at')
+                print(f"Session began: ID={session_id}, ExpiresAt={datetime.fromtimestamp(expires_at)}")
+            elif data.get('type') == "Turn":
+                transcript = data.get('transcript', '')
+                if self.speculator is not None and transcript and not data.get('end_of_turn'):
+                    self.speculator.observe_partial(transcript)
+                if transcript and data.get('turn_is_formatted'):
+                    self.emit('message', 'customer', transcript, data.get('end_of_turn', False))
+                    if data.get('end_of_turn'):
+                        self.submit_text(transcript)  # Process immediately
+            elif data.get('type') == "Termination":
+                audio_duration = data.get('audio_duration_seconds', 0)
+                print(f"Session terminated: Audio Duration={audio_duration}s")
+            elif data.get('type') == "error":
+                self.emit('message', 'error', f"STT error: {data.get('message')}", True)
+                self.emit('status', 'error')
+        except Exception as e:
+            print(f"on_message error: {e}")
+
+    def on_error(self, ws, error):
+        self.emit('message', 'error', f"Error: STT connection failed - {error}", True)
+        self.emit('status', 'error')
+
+    def on_stt_state(self, state, *args):
+        if state == 'reconnecting':
+            print(f"STT connection lost, reconnecting in {args[0]:.1f}s")
+            self.emit('status', 'reconnecting')
+        elif state == 'connected':
+            metrics = self.stt.metrics()
+            self.set_stat('reconnects', metrics['reconnects'])
+            if metrics['outages']:
+                self.set_stat('outage', f"{self.stt.outages[-1]:.1f}s")
+        elif state == 'failed':
+            self.emit('message', 'error', "STT connection could not be re-established", True)
+            self.stop()
+        elif state == 'closed':
+            self.emit('status', 'offline')
+
+    # ------------ LLM WORKER ------------
+    def _get_llm_client(self):
+        if self.llm_client is None:
+            from llm import get_client
+            self.llm_client = get_client(self.config['openai_api_key'], self.config.get('openai_base_url') or None)
+        return self.llm_client
+
+    @property
+    def conversation_history(self):
+        return self.history.messages()
+
+    def reset_history(self):
+        # Initialize conversation history with the system message
+        self.history.reset(SYSTEM_PROMPT)
+
+    def begin_turn(self, text):
+        # Records a customer turn and returns the messages to send to the LLM
+        self.emit('status', 'processing')
+        self.set_stat('responses', self.stats['responses'] + 1)
+
+        # Trims to the token budget, folding evicted turns into the rolling summary
+        self.history.add('user', text)
+        self.set_stat('prompt_tokens', self.history.total_tokens)
+        return self.history.messages()
+
+    def preview_messages(self, text):
+        # The messages a turn with this text would send, without touching the history
+        return self.history.preview(text)
+
+    def report_generation(self, timer):
+        # Splits the turn latency into time-to-first-token and streaming rate
+        sample = timer.finish()
+        if sample is not None:
+            self.set_stat('ttft', f"{sample['ttft']:.2f}s")
+            self.set_stat('tokens_per_sec', f"{sample['tokens_per_sec']:.0f}")
+            self.set_stat('gen_time', f"{sample['generation']:.1f}s")
+
+    def finish_turn(self, assistant_response, start_time):
+        # Add assistant response to conversation history
+        self.history.add('assistant', assistant_response)
+
+        # Mark the end of the assistant's response
+        self.emit('message', 'assistant', "\n\n", True)
+
+        latency = time.time() - start_time
+        self.set_stat('latency', f'{latency:.1f}s')
+        self.emit('response_complete', assistant_response)
+        self.emit('status', 'online')
+
+    def report_trace(self, trace, stages):
+        # Rolling p50/p95/p99 of the stages the panel shows
+        summary = self.tracer.summary()
+        for stage in ('stt', 'ttft', 'sentence', 'render', 'e2e'):
+            if stage in stages:
+                self.set_stat(f'stage_{stage}', format_quantiles(summary.get(stage)))
+
+    # ------------ RESPONSE CACHE ------------
+    def open_cache(self):
+        from cache import open_response_cache
+        self.cache = open_response_cache(self.config)
+
+    def lookup_cache(self, text, messages):
+        # Cached chunks are replayed with the same chunking as the original stream
+        if self.cache is None:
+            return None
+        chunks = self.cache.get(text, messages)
+        self.set_stat('cache', f"{self.cache.hit_rate:.0%} ({self.cache.hits})")
+        if chunks is not None:
+            self.set_stat('time_saved', f"{self.cache.time_saved:.1f}s")
+        return chunks
+
+    def remember_response(self, text, messages, chunks, elapsed):
+        if self.cache is not None:
+            self.cache.put(text, messages, chunks, elapsed)
+        if self.router is not None:
+            self.router.observe(elapsed)
+
+    # ------------ INTENT ROUTER ------------
+    def open_router(self):
+        if self.config.get('intent_router', True):
+            from router import IntentRouter
+            self.router = IntentRouter()
+        else:
+            self.router = None
+
+    def route_turn(self, text, messages):
+        # Templated reply chunks for greeting/identity/out-of-scope turns, or None
+        if self.router is None:
+            return None
+        chunks = self.router.route(text, messages)
+        counts = self.router.counts
+        self.set_stat('router', f"{counts['deflect']} deflected / {counts['script']} scripted / {counts['llm']} to LLM")
+        if chunks is not None:
+            self.set_stat('router_saved', f"{self.router.time_saved:.1f}s")
+        return chunks
+
+    def local_reply(self, text, messages):
+        # A reply that needs no LLM call: routed by intent, else from the response cache
+        chunks = self.route_turn(text, messages)
+        return chunks if chunks is not None else self.lookup_cache(text, messages)
+
+    def stream_completion(self, client, messages, cancelled=None):
+        # Yields content deltas; closing the HTTP stream is how a request is cancelled
+        resp = client.chat.completions.create(messages=messages, stream=True, **LLM_PARAMS)
+        try:
+            for chunk in resp:
+                if cancelled is not None and cancelled.is_set():
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            close = getattr(resp, 'close', None)
+            if close is not None:
+                close()
+
+    def scheduled_completion(self, client, messages, cancelled=None):
+        # stream_completion behind the process-wide rate limits, retries and circuit breaker
+        return self.scheduler.stream(
+            self.session_id, self.history.total_tokens,
+            lambda: self.stream_completion(client, messages, cancelled),
+            max_tokens=LLM_PARAMS['max_tokens'])
+
+    def recover_reply(self, error, partial):
+        # A reply that died mid-stream keeps what the customer already saw; one
+        # that never started (upstream down, or queued too long) gets the
+        # holding reply instead of silence
+        from scheduler import FALLBACK_REPLY
+        print(f"GPT error: {error}")
+        if partial:
+            return partial
+        self.set_stat('llm_fallbacks', self.stats.get('llm_fallbacks', 0) + 1)
+        self.open_reply()
+        self.emit_reply(FALLBACK_REPLY)
+        return FALLBACK_REPLY
+
+    def open_reply(self):
+        self.emit('message', 'assistant', f"[{timestamp()}] TJ: ", False)
+
+    def emit_reply(self, content):
+        # One piece of TJ's reply: to the UI as is, and to the output sinks as whole sentences
+        self.emit('message', 'assistant', content, False)
+        self.output.push(content)
+
+    # ------------ BARGE-IN ------------
+    # With 'barge_in' on, a customer who speaks again while TJ is answering
+    # takes priority over the answer: the stream is cancelled at the next
+    # token, and every turn that queued up meanwhile is answered by a single
+    # request. Text already shown stays in the history as TJ's (cut-off)
+    # reply; a reply that hadn't shown anything yet is dropped unseen.
+    def merge_turns(self, turns):
+        # [(text, trace), ...] oldest first -> one (text, trace) for the newest
+        texts = [text for text, _ in turns if text]
+        traces = [trace for _, trace in turns if trace is not None]
+        for trace in traces[:-1]:
+            self.tracer.finish(trace)  # keeps their STT timing
+        if len(texts) > 1:
+            self.barge_ins['merged'] += len(texts) - 1
+            self.report_barge_ins()
+            self.emit('turns_settled', len(texts) - 1)
+        return " ".join(texts), (traces[-1] if traces else None)
+
+    def interrupt_turn(self, trace, partial, start_time):
+        self.output.end(partial, cut=True)
+        self.tracer.finish(trace)
+        if partial:
+            self.barge_ins['cut'] += 1
+            self.finish_turn(partial, start_time)
+        else:
+            self.barge_ins['dropped'] += 1
+            self.emit('turns_settled', 1)
+        self.report_barge_ins()
+
+    def report_barge_ins(self):
+        counts = self.barge_ins
+        self.set_stat('barge_in', f"{counts['cut']} cut / {counts['dropped']} dropped / {counts['merged']} merged")
+
+    def report_case_note(self, note):
+        # Runs on the case-note sink's thread
+        self.case_notes += 1
+        self.set_stat('case_notes', f"{self.case_notes} filed (last: {outcome_kind(note['outcome'])})")
+
+    def report_scheduler(self):
+        stats = self.scheduler.stats()
+        health = stats['breaker'] if stats['breaker'] != 'closed' else 'ok'
+        value = f"{health} ({stats['retried']} retries, {self.stats.get('llm_fallbacks', 0)} held)"
+        if value != self.stats.get('llm_health'):
+            self.set_stat('llm_health', value)
+
+    def gpt_worker(self):
+        client = self._get_llm_client()
+        self.reset_history()
+
+        while self.is_running:
+            text = trace = None
+            try:
+                turns = [self.stt_q.get(timeout=1.0)]
+                while self.barge_in:
+                    try:
+                        turns.append(self.stt_q.get_nowait())
+                    except queue.Empty:
+                        break
+                text, trace = self.merge_turns(turns)
+                if not text:
+                    continue
+
+                trace = self.tracer.request(trace)
+                self.output.begin(trace)
+                messages = self.begin_turn(text)
+                context = list(messages)
+                start_time = time.time()
+                timer = self.llm_metrics.start()
+                tokens = cached = self.local_reply(text, context)
+                if cached is not None:
+                    if self.speculator is not None:
+                        self.speculator.cancel()
+                elif self.speculator is not None:
+                    tokens = self.speculator.claim(text, messages)
+                if tokens is None:
+                    tokens = self.scheduled_completion(client, messages)
+
+                # Collect streamed response; the UI gets the reply header with the first token
+                assistant_response = ""
+                chunks = []
+                failed = interrupted = False
+                try:
+                    for content in tokens:
+                        if self.barge_in and not self.stt_q.empty():
+                            interrupted = True
+                            break
+                        timer.token()
+                        if timer.tokens == 1:
+                            self.tracer.first_token(trace)
+                            self.open_reply()
+                        assistant_response += content
+                        chunks.append(content)
+                        self.emit_reply(content)
+                except Exception as e:
+                    failed = True
+                    assistant_response = self.recover_reply(e, assistant_response)
+
+                if interrupted:
+                    # Closing the generator closes the HTTP stream
+                    close = getattr(tokens, 'close', None)
+                    if close is not None:
+                        close()
+                    if self.speculator is not None:
+                        self.speculator.cancel()
+                    self.interrupt_turn(trace, assistant_response, start_time)
+                    continue
+
+                self.output.end(assistant_response)
+                self.tracer.finish(trace)
+                self.report_generation(timer)
+                if cached is None and not failed:
+                    self.remember_response(text, context, chunks, time.time() - start_time)
+                self.finish_turn(assistant_response, start_time)
+                self.report_scheduler()
+
+            except queue.Empty:
+                continue
+            except Exception as e:
+                print(f"GPT error: {e}")
+                if trace is not None:
+                    self.tracer.finish(trace)
+                if text:
+                    self.emit('turns_settled', 1)
+                self.emit('status', 'error')
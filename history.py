@@ -0,0 +1,167 @@
+import re
+import threading
+from collections import deque
+
+# ------------ CONVERSATION HISTORY ------------
+# Keeps the prompt under a token budget instead of a fixed message count.
+# Every message carries its token count, so the running total is updated
+# incrementally. Turns that fall out of the window are folded into a rolling
+# extractive summary, except the customer's name, Apple ID and issue
+# statement (steps 2-4 of the script), which stay pinned in context.
+HISTORY_TOKEN_BUDGET = 1500
+SUMMARY_TOKEN_CAP = 250
+MAX_PINNED = 6
+PIN_TOKEN_CAP = 60    # a pinned statement is clipped to this many tokens
+MESSAGE_OVERHEAD = 4  # role and separators per chat message
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+|\b(?:at|@)\s*\w+\s*(?:dot|\.)\s*(?:com|net|org|me|edu)\b", re.I)
+NAME_RE = re.compile(r"\b(?:my name is|my name's|this is)\s+\w+", re.I)
+# TJ asking outright for the customer's name or Apple ID (step 2) or the issue
+# (step 3); a reply that merely mentions an email or Apple ID doesn't count
+PIN_PROMPT_RE = re.compile(
+    r"\b(?:may i (?:have|get)|can i (?:have|get)|could you (?:give|tell|share|confirm)|"
+    r"what(?:'s| is))\b[^?.!]*\b(?:your (?:first and last |full )?name|apple id|email)\b[^?]*\?"
+    r"|\bwhat can i help you with today\b", re.I)
+
+_encoder = False
+
+def count_tokens(text):
+    # tiktoken when it is installed, otherwise the usual ~4 characters per token estimate
+    global _encoder
+    if _encoder is False:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoder = None
+    if _encoder is not None:
+        return len(_encoder.encode(text)) + MESSAGE_OVERHEAD
+    return (len(text) + 3) // 4 + MESSAGE_OVERHEAD
+
+def clip_tokens(text, cap):
+    if count_tokens(text) <= cap:
+        return text
+    words = text.split()
+    while len(words) > 1 and count_tokens(" ".join(words) + "…") > cap:
+        words.pop()
+    return " ".join(words) + "…"
+
+def first_sentence(text, max_words=20):
+    words = text.split()
+    out = []
+    for word in words[:max_words]:
+        out.append(word)
+        if word.endswith(('.', '?', '!')):
+            break
+    line = " ".join(out)
+    return line if len(out) == len(words) or line.endswith(('.', '?', '!')) else line + "…"
+
+class ConversationHistory:
+    def __init__(self, system_prompt, budget=HISTORY_TOKEN_BUDGET, summary_cap=SUMMARY_TOKEN_CAP):
+        self.budget = budget
+        self.summary_cap = summary_cap
+        # The speculator renders previews on its timer thread while the LLM worker adds turns
+        self._lock = threading.RLock()
+        self.reset(system_prompt)
+
+    def reset(self, system_prompt):
+        with self._lock:
+            self.system = {"role": "system", "content": system_prompt}
+            self.system_tokens = count_tokens(system_prompt)
+            self.entries = deque()   # (message, tokens)
+            self.entry_tokens = 0
+            self.pinned = []         # customer statements from the identity/issue steps
+            self.pin_count = 0       # pinned turns, evicted or still in the window
+            self.summary = deque()   # (line, tokens)
+            self.summary_tokens = 0
+            self.evicted = 0
+            self._context = None
+            self._context_count = 0
+            self._rendered = None
+
+    # ---- accounting ----
+    @property
+    def total_tokens(self):
+        with self._lock:
+            return self.system_tokens + self._context_tokens() + self.entry_tokens
+
+    def _context_tokens(self):
+        self._context_message()
+        return self._context_count
+
+    def _context_message(self):
+        # Pinned details and the rolling summary, rebuilt only after an eviction
+        if self._context is None:
+            parts = []
+            if self.pinned:
+                parts.append("Customer details given earlier in this call:\n" + "\n".join(f"- {p}" for p in self.pinned))
+            if self.summary:
+                parts.append("Summary of the earlier conversation:\n" + "\n".join(line for line, _ in self.summary))
+            self._context = {"role": "system", "content": "\n\n".join(parts)} if parts else {}
+            self._context_count = count_tokens(self._context['content']) if parts else 0
+        return self._context or None
+
+    # ---- updates ----
+    def add(self, role, content):
+        message = {"role": role, "content": content}
+        tokens = count_tokens(content)
+        with self._lock:
+            if role == 'user' and self._should_pin(content):
+                message['pinned'] = True
+                self.pin_count += 1
+            self.entries.append((message, tokens))
+            self.entry_tokens += tokens
+            self._rendered = None
+            if role == 'user':
+                self.trim()
+
+    def _should_pin(self, content):
+        if self.pin_count >= MAX_PINNED:
+            return False
+        if EMAIL_RE.search(content) or NAME_RE.search(content):
+            return True
+        if self.entries and self.entries[-1][0]['role'] == 'assistant':
+            return PIN_PROMPT_RE.search(self.entries[-1][0]['content']) is not None
+        return False
+
+    def trim(self):
+        # Evict the oldest messages until under budget, always keeping the newest turn
+        with self._lock:
+            while self.total_tokens > self.budget and len(self.entries) > 1:
+                message, tokens = self.entries.popleft()
+                self.entry_tokens -= tokens
+                self.evicted += 1
+                if message.get('pinned'):
+                    self.pinned.append(clip_tokens(message['content'], PIN_TOKEN_CAP))
+                else:
+                    self._summarize(message)
+                self._context = None
+                self._rendered = None
+
+    def _summarize(self, message):
+        speaker = "Customer" if message['role'] == 'user' else "TJ"
+        line = f"{speaker}: {first_sentence(message['content'])}"
+        tokens = count_tokens(line)
+        self.summary.append((line, tokens))
+        self.summary_tokens += tokens
+        while self.summary_tokens > self.summary_cap and len(self.summary) > 1:
+            _, dropped = self.summary.popleft()
+            self.summary_tokens -= dropped
+
+    # ---- rendering ----
+    def messages(self):
+        # Cached until the next change, so unchanged history is not rebuilt per turn
+        with self._lock:
+            if self._rendered is None:
+                rendered = [self.system]
+                context = self._context_message()
+                if context:
+                    rendered.append(context)
+                rendered.extend({"role": m['role'], "content": m['content']} for m, _ in self.entries)
+                self._rendered = rendered
+            return self._rendered
+
+    def preview(self, text):
+        # The messages a new user turn would send, without recording it
+        with self._lock:
+            return self.messages() + [{"role": "user", "content": text}]
@@ -0,0 +1,140 @@
+import importlib
+import threading
+import time
+from collections import deque
+
+# ------------ SHARED LLM CLIENT ------------
+# One long-lived OpenAI client per process (per API key) with a tuned
+# connection pool, so calls reuse warm TLS connections instead of paying DNS,
+# TLS and HTTP/2 setup on the first turn of every call. The SDK's own retries
+# are off; scheduler.py retries with backoff under the shared rate limits.
+POOL_MAX_CONNECTIONS = 50
+POOL_MAX_KEEPALIVE = 20
+POOL_KEEPALIVE_EXPIRY = 120.0
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+
+_clients = {}
+_lock = threading.Lock()
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _http_module():
+    # The SDK's own HTTP client factories: openai builds on httpx2 in newer
+    # releases and on httpx before that. None leaves the SDK's default pool.
+    import openai
+    for module, sync, aio in (('httpx2', 'DefaultHttpx2Client', 'DefaultAsyncHttpx2Client'),
+                              ('httpx', 'DefaultHttpxClient', 'DefaultAsyncHttpxClient')):
+        if not hasattr(openai, sync):
+            continue
+        try:
+            return importlib.import_module(module), getattr(openai, sync), getattr(openai, aio)
+        except ImportError:
+            continue
+    return None
+
+def _pool_kwargs(http):
+    return {
+        'limits': http.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY
+        ),
+        'timeout': http.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        'http2': _http2_available(),
+    }
+
+def _http_client(async_=False):
+    found = _http_module()
+    if found is None:
+        return None
+    http, sync, aio = found
+    return (aio if async_ else sync)(**_pool_kwargs(http))
+
+def get_client(api_key, base_url=None):
+    with _lock:
+        client = _clients.get(('sync', api_key, base_url))
+        if client is None:
+            import openai
+            client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                                   http_client=_http_client())
+            _clients[('sync', api_key, base_url)] = client
+        return client
+
+def get_async_client(api_key, base_url=None):
+    with _lock:
+        client = _clients.get(('async', api_key, base_url))
+        if client is None:
+            import openai
+            client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                                        http_client=_http_client(async_=True))
+            _clients[('async', api_key, base_url)] = client
+        return client
+
+def warm_up(client, model):
+    # Opens a pooled connection in the background so the first turn finds it ready
+    def run():
+        start = time.perf_counter()
+        try:
+            client.models.retrieve(model)
+            print(f"LLM connection warmed in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"LLM warm-up failed: {e}")
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+# ------------ LLM LATENCY METRICS ------------
+class GenerationTimer:
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.last_token = None
+        self.tokens = 0
+
+    def token(self):
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+        self.last_token = now
+        self.tokens += 1
+
+    def finish(self):
+        return self.metrics.record(self)
+
+class LLMMetrics:
+    def __init__(self, alpha=0.2, keep=1000):
+        self.alpha = alpha
+        self.turns = 0
+        self.last = {}
+        self.average = {}
+        self.recent = deque(maxlen=keep)
+
+    def start(self):
+        return GenerationTimer(self)
+
+    def record(self, timer):
+        if timer.first_token is None:
+            return None
+        end = timer.last_token
+        generation = end - timer.first_token
+        sample = {
+            'ttft': timer.first_token - timer.started,
+            'total': end - timer.started,
+            'generation': generation,
+            'tokens': timer.tokens,
+            'tokens_per_sec': (timer.tokens - 1) / generation if generation > 0 and timer.tokens > 1 else 0.0,
+        }
+        self.turns += 1
+        self.last = sample
+        self.recent.append(sample)
+        for key, value in sample.items():
+            prev = self.average.get(key)
+            self.average[key] = value if prev is None else prev + self.alpha * (value - prev)
+        return sample
@@ -0,0 +1,249 @@
+import json
+import queue
+import re
+import threading
+import time
+
+# ------------ STREAMING OUTPUT STAGE ------------
+# Cuts TJ's reply into sentences (and, once a sentence runs long, clauses) as
+# the tokens arrive, and hands each segment to the registered sinks the
+# moment it closes - a speech synthesizer can start on the first sentence
+# while the LLM is still writing the rest. Every sink has its own bounded
+# queue and thread, so a slow sink drops its own segments (and counts them)
+# instead of holding up the LLM stream, the UI or the other sinks.
+SINK_QUEUE_SIZE = 64
+CLAUSE_MIN_CHARS = 60   # a clause break only splits a segment at least this long
+SINK_POLL = 0.5
+
+SENTENCE = 'sentence'
+CLAUSE = 'clause'
+
+# Sentence punctuation (plus closing quotes/brackets) followed by whitespace,
+# a newline, or clause punctuation followed by whitespace
+_BOUNDARY_RE = re.compile(r"[.!?…]+[\"'’”)\]]*(?=\s)|\n|[,;:—](?=\s)")
+_LAST_WORD_RE = re.compile(r"(\w+)\W*$")
+ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'jr', 'sr', 'st', 'vs', 'approx'}   # plus any single letter (e.g., J. Lee)
+_LOOKBACK = 4   # characters rescanned on each push, for boundaries split across deltas
+
+class Segment:
+    __slots__ = ('session_id', 'reply', 'index', 'text', 'kind', 'at')
+
+    def __init__(self, session_id, reply, index, text, kind, at):
+        self.session_id = session_id
+        self.reply = reply     # reply number within the session
+        self.index = index     # segment number within the reply
+        self.text = text
+        self.kind = kind
+        self.at = at           # seconds since the LLM request
+
+    def to_dict(self):
+        return {'session_id': self.session_id, 'reply': self.reply, 'index': self.index,
+                'text': self.text, 'kind': self.kind, 'at': round(self.at, 4)}
+
+class SentenceSegmenter:
+    def __init__(self, clauses=True, clause_min_chars=CLAUSE_MIN_CHARS):
+        self.clauses = clauses
+        self.clause_min_chars = clause_min_chars
+        self.reset()
+
+    def reset(self):
+        self._text = ""
+        self._start = 0   # where the open segment begins
+        self._scan = 0    # where the next search may begin
+
+    def push(self, delta):
+        # [(text, kind), ...] for the segments this delta closed
+        self._text += delta
+        out = []
+        for match in _BOUNDARY_RE.finditer(self._text, max(self._start, self._scan)):
+            end = match.end()
+            mark = match.group()
+            if mark == "\n":
+                kind = SENTENCE
+            elif mark[0] in ".!?…":
+                if mark == "." and self._abbreviation(match.start()):
+                    continue
+                if len(self._text[self._start:match.start()].strip()) < 3:
+                    continue   # a list marker like "1." opens the next sentence
+                kind = SENTENCE
+            else:
+                if not self.clauses or end - self._start < self.clause_min_chars:
+                    continue
+                kind = CLAUSE
+            segment = self._text[self._start:end].strip()
+            self._start = end
+            if segment:
+                out.append((segment, kind))
+        self._scan = max(self._start, len(self._text) - _LOOKBACK)
+        if self._start > 4096:
+            self._text = self._text[self._start:]
+            self._scan -= self._start
+            self._start = 0
+        return out
+
+    def _abbreviation(self, dot):
+        word = _LAST_WORD_RE.search(self._text, max(self._start, dot - 12), dot)
+        if word is None:
+            return False
+        word = word.group(1).lower()
+        return len(word) == 1 or word in ABBREVIATIONS
+
+    def flush(self):
+        # The unterminated tail of the reply, if any
+        segment = self._text[self._start:].strip()
+        self.reset()
+        return [(segment, SENTENCE)] if segment else []
+
+class OutputSink:
+    # Both methods run on the sink's own thread
+    def segment(self, segment):
+        pass
+
+    def reply_end(self, session_id, reply, text, cut):
+        pass
+
+class SegmentLogSink(OutputSink):
+    # One JSON line per segment and per finished reply
+    def __init__(self, path):
+        self.path = path
+
+    def _write(self, record):
+        with open(self.path, 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps(record) + '\n')
+
+    def segment(self, segment):
+        self._write(segment.to_dict())
+
+    def reply_end(self, session_id, reply, text, cut):
+        self._write({'session_id': session_id, 'reply': reply, 'end': True, 'cut': cut})
+
+class SinkWorker:
+    def __init__(self, sink, maxsize=SINK_QUEUE_SIZE):
+        self.sink = sink
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.delivered = 0
+        self._q = None
+        self._stopping = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # A thread that was told to stop but hasn't exited yet just carries on
+        with self._lock:
+            self._stopping = False
+            if self._thread is not None:
+                return
+            self._q = queue.Queue(self.maxsize)
+            self._thread = threading.Thread(target=self.run, name='output-sink', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        # Delivers what is already queued, then the thread exits
+        with self._lock:
+            self._stopping = True
+
+    def offer(self, method, *args):
+        if self._q is None:
+            return
+        try:
+            self._q.put_nowait((method, args))
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        q = self._q
+        while True:
+            try:
+                method, args = q.get(timeout=SINK_POLL)
+            except queue.Empty:
+                with self._lock:
+                    if self._stopping:
+                        self._thread = None
+                        break
+                continue
+            try:
+                getattr(self.sink, method)(*args)
+                self.delivered += 1
+            except Exception as e:
+                print(f"Output sink error ({type(self.sink).__name__}): {e}")
+
+class OutputStage:
+    # One per engine; fed from the LLM worker (or the asyncio loop) as tokens arrive
+    def __init__(self, tracer, clauses=True, queue_size=SINK_QUEUE_SIZE):
+        self.tracer = tracer
+        self.segmenter = SentenceSegmenter(clauses)
+        self.queue_size = queue_size
+        self.workers = []
+        self.session_id = None
+        self.replies = 0
+        self.running = False
+        self._trace = None
+        self._started = 0.0
+        self._index = 0
+        self._sentences = 0
+        self._open = False
+
+    def add_sink(self, sink, maxsize=None):
+        worker = SinkWorker(sink, maxsize or self.queue_size)
+        self.workers.append(worker)
+        if self.running:
+            worker.start()
+        return worker
+
+    def remove_sink(self, sink):
+        for worker in [w for w in self.workers if w.sink is sink]:
+            worker.stop()
+            self.workers.remove(worker)
+
+    def start(self):
+        self.running = True
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        self.running = False
+        for worker in self.workers:
+            worker.stop()
+
+    @property
+    def dropped(self):
+        return sum(w.dropped for w in self.workers)
+
+    # ---- per reply ----
+    def begin(self, trace):
+        self._trace = trace
+        self._started = time.monotonic()
+        self._open = False
+
+    def push(self, delta):
+        if not self._open:
+            self._open = True
+            self._index = 0
+            self._sentences = 0
+            self.replies += 1
+            self.segmenter.reset()
+        for text, kind in self.segmenter.push(delta):
+            self._send(text, kind)
+
+    def end(self, text, cut=False):
+        if not self._open:
+            return
+        self._open = False
+        # A barged-in reply's unfinished tail is never spoken; reply_end still carries all of it
+        tail = self.segmenter.flush()
+        if not cut:
+            for segment, kind in tail:
+                self._send(segment, kind)
+        for worker in self.workers:
+            worker.offer('reply_end', self.session_id, self.replies, text, cut)
+
+    def _send(self, text, kind):
+        if kind == SENTENCE:
+            if not self._sentences and self._trace is not None:
+                self.tracer.first_sentence(self._trace)
+            self._sentences += 1
+        segment = Segment(self.session_id, self.replies, self._index, text, kind, time.monotonic() - self._started)
+        self._index += 1
+        for worker in self.workers:
+            worker.offer('segment', segment)
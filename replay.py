@@ -0,0 +1,108 @@
+import argparse
+import glob
+import os
+import threading
+import time
+
+from audio_sources import FileSource
+from engine import load_config
+from sessions import SessionManager
+from transcript import TranscriptStore
+
+# ------------ BATCH REPLAY ------------
+# Reprocesses archived calls through the same STT and LLM path as a live call:
+# every recording runs as its own session (up to --concurrency at once), paced
+# in real time or, with --fast, as fast as the pipeline takes the audio. Each
+# call's final turns are written to <out>/<recording>.jsonl.
+#
+#   python replay.py recordings/ --fast --concurrency 8 --out transcripts/replay
+SETTLE_SECONDS = 5.0   # after the recording ends, quiet time before the call is closed
+MAX_SETTLE_SECONDS = 60.0
+
+def replay_call(manager, path, out_dir, realtime, settle=SETTLE_SECONDS, **engine_kwargs):
+    name = os.path.splitext(os.path.basename(path))[0]
+    store = TranscriptStore(os.path.join(out_dir, f"{name}.jsonl"))
+    engine = manager.open_session(session_id=name, timeout=None,
+                                  audio_source=FileSource(path, realtime=realtime), **engine_kwargs)
+    ended = threading.Event()
+    state = {'pending': 0, 'last': time.monotonic(), 'turns': 0}
+    lock = threading.Lock()
+
+    def on_event(event, *args):
+        with lock:
+            if event == 'message' and args[0] == 'customer' and args[2]:
+                store.append('customer', args[1])
+                state['pending'] += 1
+                state['turns'] += 1
+            elif event == 'response_complete':
+                store.append('assistant', args[0])
+                state['pending'] = max(0, state['pending'] - 1)
+            elif event == 'turns_settled':
+                state['pending'] = max(0, state['pending'] - args[0])
+            elif event == 'source_ended':
+                ended.set()
+            else:
+                return
+            state['last'] = time.monotonic()
+
+    engine.subscribe(on_event)
+    started = time.monotonic()
+    try:
+        engine.start()
+        ended.wait()
+        # The last turn is still in flight at the STT and LLM; wait for it to go quiet
+        deadline = time.monotonic() + MAX_SETTLE_SECONDS
+        while time.monotonic() < deadline:
+            with lock:
+                if state['pending'] == 0 and time.monotonic() - state['last'] >= settle:
+                    break
+            time.sleep(0.1)
+    finally:
+        manager.close_session(name)
+        store.close()
+    return {'call': name, 'turns': state['turns'], 'seconds': round(time.monotonic() - started, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded calls through the support pipeline")
+    parser.add_argument('path', help="a recording (16-bit WAV at any rate, or 16 kHz .raw/.pcm s16le) or a directory of them")
+    parser.add_argument('--pattern', default='*.wav')
+    parser.add_argument('--fast', action='store_true', help="don't pace audio in real time")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--out', default=os.path.join('transcripts', 'replay'))
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.fast:
+        # Silence suppression keys off wall-clock keepalives; the STT needs the
+        # recorded pauses themselves to find turn ends when audio outruns real time
+        config['vad_enabled'] = False
+    paths = sorted(glob.glob(os.path.join(args.path, args.pattern))) if os.path.isdir(args.path) else [args.path]
+    if not paths:
+        raise SystemExit(f"No {args.pattern} files in {args.path}")
+
+    manager = SessionManager(config, capacity=args.concurrency)
+    results = []
+
+    def run(path):
+        try:
+            result = replay_call(manager, path, args.out, realtime=not args.fast)
+        except Exception as e:
+            result = {'call': os.path.basename(path), 'error': str(e)}
+        results.append(result)
+        print(result)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=run, args=(path,), daemon=True) for path in paths]
+    for thread in threads:
+        thread.start()  # open_session() holds each one until a slot frees up
+    for thread in threads:
+        thread.join()
+    manager.shutdown()
+    failed = [r for r in results if 'error' in r]
+    print(f"Replayed {len(results) - len(failed)}/{len(paths)} calls, "
+          f"{sum(r.get('turns', 0) for r in results)} turns in {time.monotonic() - started:.1f}s")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+import threading
+import time
+
+# ------------ AUDIO RING BUFFER ------------
+# Fixed-capacity byte ring between the capture thread and the STT sender.
+# Memory is allocated once up front, so a stalled socket costs at most
+# `capacity` bytes. Readers get zero-copy memoryview spans of contiguous
+# data and release them with consume().
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+class AudioRingBuffer:
+    def __init__(self, capacity, policy=DROP_OLDEST, align=2, block_timeout=0.5):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        capacity -= capacity % align
+        if capacity <= 0:
+            raise ValueError("Ring buffer capacity must be positive")
+        self.capacity = capacity
+        self.policy = policy
+        self.align = align
+        self.block_timeout = block_timeout
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._cond = threading.Condition()
+        self.clear()
+
+    def clear(self):
+        with self._cond:
+            self._head = 0    # read position
+            self._size = 0    # bytes available
+            self._held = 0    # bytes handed out by peek() and not yet consumed
+            self.closed = False
+            self.overruns = 0
+            self.dropped_bytes = 0
+            self.bytes_written = 0
+            self._cond.notify_all()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def free(self):
+        return self.capacity - self._size
+
+    def close(self):
+        # Wakes blocked readers/writers; readers still drain what is left
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        n = len(data)
+        if n == 0:
+            return 0
+        with self._cond:
+            if self.closed:
+                return 0
+            if n > self.free:
+                n = self._make_room(n)
+                if n == 0:
+                    return 0
+                data = data[len(data) - n:] if self.policy == DROP_OLDEST else data[:n]
+
+            tail = (self._head + self._size) % self.capacity
+            first = min(n, self.capacity - tail)
+            self._view[tail:tail + first] = data[:first]
+            if first < n:
+                self._view[:n - first] = data[first:n]
+            self._size += n
+            self.bytes_written += n
+            self._cond.notify_all()
+            return n
+
+    def _make_room(self, n):
+        # Called with the lock held when `n` bytes don't fit; returns how many bytes to write.
+        # An overrun is a write that loses audio, not one that had to wait.
+        if self.policy == BLOCK:
+            deadline = time.monotonic() + self.block_timeout
+            while n > self.free and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if n <= self.free:
+                return n
+        elif self.policy == DROP_OLDEST:
+            # Never drop bytes a reader is currently holding via peek()
+            droppable = self._size - self._held
+            need = n - self.free
+            need += -need % self.align
+            drop = min(need, droppable)
+            if drop:
+                self._head = (self._head + drop) % self.capacity
+                self._size -= drop
+                self.dropped_bytes += drop
+            if n <= self.free:
+                if drop:
+                    self.overruns += 1
+                return n
+        # DROP_NEWEST, or no room could be made: keep what fits, drop the rest
+        fit = self.free - self.free % self.align
+        self.dropped_bytes += n - fit
+        self.overruns += 1
+        return fit
+
+    def peek(self, max_bytes=None, min_bytes=1, timeout=None):
+        # Zero-copy view of the oldest contiguous span (at most up to the wrap point).
+        # The view stays valid until consume() is called.
+        with self._cond:
+            if not self._wait_for(min_bytes, timeout):
+                return None
+            n = self._size if max_bytes is None else min(self._size, max_bytes)
+            n = min(n, self.capacity - self._head)
+            if n >= self.align:
+                n -= n % self.align
+            self._held = n
+            return self._view[self._head:self._head + n]
+
+    def consume(self, n):
+        with self._cond:
+            n = min(n, self._size)
+            self._head = (self._head + n) % self.capacity
+            self._size -= n
+            self._held = 0
+            if self._size == 0:
+                self._head = 0
+            self._cond.notify_all()
+
+    def release(self):
+        # Give back a peek()ed span without consuming it (e.g. the send failed)
+        with self._cond:
+            self._held = 0
+
+    def read(self, max_bytes=None, min_bytes=1, timeout=None):
+        # Copying read that also stitches together data across the wrap point
+        with self._cond:
+            if not self._wait_for(min_bytes, timeout):
+                return b''
+            n = self._size if max_bytes is None else min(self._size, max_bytes)
+            first = min(n, self.capacity - self._head)
+            out = bytes(self._view[self._head:self._head + first])
+            if first < n:
+                out += bytes(self._view[:n - first])
+            self._head = (self._head + n) % self.capacity
+            self._size -= n
+            if self._size == 0:
+                self._head = 0
+            self._cond.notify_all()
+            return out
+
+    def _wait_for(self, min_bytes, timeout):
+        if self._size >= min_bytes:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._size < min_bytes and not self.closed:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self._cond.wait(remaining)
+        return self._size >= min_bytes or (self.closed and self._size > 0)
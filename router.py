@@ -0,0 +1,168 @@
+import re
+import time
+
+from history import EMAIL_RE
+from speculative import normalize_transcript
+
+# ------------ INTENT ROUTER ------------
+# Answers the turns whose reply is fixed by the script without an LLM call:
+# the opening hello, the name / Apple ID answer, and questions the prompt
+# says to refer elsewhere (carrier, Mac, Apple TV). Every final transcript is
+# scored against a keyword index built once at import - one dict lookup per
+# word and word pair, tens of microseconds a turn. A turn is routed only when
+# one intent clearly wins; anything that also looks like an iPhone/iPad/
+# iCloud question, or is merely close, goes to the LLM as before.
+ROUTER_MIN_SCORE = 2.5
+ROUTER_MARGIN = 2.0
+ROUTER_MAX_WORDS = 40
+GREETING_MAX_WORDS = 5
+DEFAULT_LLM_SECONDS = 1.5   # counted as saved per routed turn until real LLM timings exist
+LLM_SECONDS_ALPHA = 0.2
+
+DEFLECT = 'deflect'
+SCRIPT = 'script'
+LLM = 'llm'
+
+IN_SCOPE = 'in_scope'
+# intent -> (kind, {word or "word pair": weight})
+INTENTS = {
+    IN_SCOPE: (None, {
+        'iphone': 3, 'ipad': 3, 'icloud': 3, 'apple id': 3, 'ios': 3, 'ipados': 3, 'app store': 2.5,
+        'face id': 2.5, 'apple pay': 2, 'subscription': 2, 'subscriptions': 2, 'billing': 2, 'refund': 2,
+        'charged': 2, 'password': 1.5, 'passcode': 2, 'backup': 1.5, 'photos': 1, 'app': 1, 'apps': 1,
+    }),
+    'carrier': (DEFLECT, {
+        'carrier': 3, 'verizon': 3, 'att': 3, 'tmobile': 3, 't mobile': 3, 'sprint': 3, 'cricket': 2,
+        'cell service': 2.5, 'cellular plan': 3, 'data plan': 3, 'phone bill': 3, 'phone plan': 3,
+        'cell signal': 2, 'roaming': 2, 'minutes': 1,
+    }),
+    'mac': (DEFLECT, {
+        'mac': 2.5, 'macbook': 3, 'imac': 3, 'mac mini': 3, 'mac pro': 3, 'macos': 3, 'time machine': 2.5,
+        'sonoma': 2, 'sequoia': 2, 'ventura': 2, 'monterey': 2, 'laptop': 2, 'desktop': 1.5,
+    }),
+    'apple_tv': (DEFLECT, {
+        'apple tv': 3, 'appletv': 3, 'tvos': 3, 'siri remote': 3, 'tv remote': 2.5, 'homepod': 2.5,
+    }),
+    'greeting': (SCRIPT, {
+        'hi': 2.5, 'hello': 2.5, 'hey': 2.5, 'good morning': 2.5, 'good afternoon': 2.5, 'good evening': 2.5,
+    }),
+}
+
+TEMPLATES = {
+    'carrier': ("I'm sorry, that one is looked after by your wireless carrier rather than Apple, since it's "
+                "about your cellular plan and service. Your carrier's support line can sort that out for you. "
+                "Is there anything on your iPhone or iPad I can help you with today?"),
+    'mac': ("Thanks for explaining. I look after iPhone and iPad here, so for your Mac the right place is "
+            "Apple's Mac support team at getsupport.apple.com - choose Mac and they'll chat or call with you. "
+            "Is there anything on your iPhone or iPad I can help you with today?"),
+    'apple_tv': ("Thanks for letting me know. I look after iPhone and iPad here, so for Apple TV and HomePod "
+                 "the right place is getsupport.apple.com - choose Apple TV and the team there will help you. "
+                 "Is there anything on your iPhone or iPad I can help you with today?"),
+    'greeting': ("Hi there, thank you for contacting Apple Support, my name is TJ. "
+                 "May I have your first and last name, and the email address for your Apple ID?"),
+    'identity': "Thank you, {name}. What can I help you with today?",
+}
+
+_CHUNK_RE = re.compile(r"\S+\s*")
+_NAME_WORDS_RE = re.compile(r"\b(?:my name is|my name's|this is)\s+([a-z]+)", re.I)
+_APPLE_ID_RE = re.compile(r"\bapple\s*id\b|\bemail(?: address)?\b", re.I)
+# An assistant line asking step 2's question
+_ASKS_IDENTITY = ('your first and last name', 'your name')
+
+def build_index(intents=INTENTS):
+    # word or word pair -> ((intent, weight), ...)
+    index = {}
+    for intent, (_, keywords) in intents.items():
+        for key, weight in keywords.items():
+            index.setdefault(key, []).append((intent, weight))
+    return {key: tuple(hits) for key, hits in index.items()}
+
+INDEX = build_index()
+
+def score(words, index=INDEX):
+    scores = {}
+    for i, word in enumerate(words):
+        for key in (word, f"{words[i - 1]} {word}") if i else (word,):
+            for intent, weight in index.get(key, ()):
+                scores[intent] = scores.get(intent, 0.0) + weight
+    return scores
+
+def chunk_reply(text):
+    # Word-sized chunks, so a templated reply renders like a streamed one
+    return _CHUNK_RE.findall(text)
+
+def last_assistant(messages):
+    for message in reversed(messages):
+        if message['role'] == 'assistant':
+            return message['content']
+    return None
+
+class IntentRouter:
+    def __init__(self, min_score=ROUTER_MIN_SCORE, margin=ROUTER_MARGIN):
+        self.min_score = min_score
+        self.margin = margin
+        self.counts = {DEFLECT: 0, SCRIPT: 0, LLM: 0}
+        self.intents = {}
+        self.time_saved = 0.0
+        self.llm_seconds = DEFAULT_LLM_SECONDS   # moving average of a full LLM reply
+        self.route_time = 0.0
+        self.turns = 0
+
+    def classify(self, text, messages):
+        # (intent, reply) for a turn to answer locally, else None
+        words = normalize_transcript(text).split()
+        if not words or len(words) > ROUTER_MAX_WORDS:
+            return None
+        prompt = (last_assistant(messages[:-1]) or '').lower()
+        if any(p in prompt for p in _ASKS_IDENTITY):
+            name = self.identity(text)
+            if name:
+                return 'identity', TEMPLATES['identity'].format(name=name)
+        ranked = sorted(score(words).items(), key=lambda item: item[1], reverse=True)
+        if not ranked:
+            return None
+        intent, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if intent == IN_SCOPE or best < self.min_score or best - runner_up < self.margin:
+            return None
+        if intent == 'greeting' and (self.turns or len(words) > GREETING_MAX_WORDS):
+            return None
+        return intent, TEMPLATES[intent]
+
+    def identity(self, text):
+        # Step 2's answer - a name and an Apple ID and nothing else worth the LLM's time
+        name = _NAME_WORDS_RE.search(text)
+        if not name or not EMAIL_RE.search(text):
+            return None
+        rest = _APPLE_ID_RE.sub(' ', EMAIL_RE.sub(' ', text))
+        if score(normalize_transcript(rest).split()):
+            return None
+        return name.group(1).capitalize()
+
+    def observe(self, elapsed):
+        # Timing of a reply that did go to the LLM; what a routed turn saves
+        self.llm_seconds += LLM_SECONDS_ALPHA * (elapsed - self.llm_seconds)
+
+    def route(self, text, messages):
+        # Reply chunks for a turn answered locally, or None to ask the LLM
+        started = time.perf_counter()
+        routed = self.classify(text, messages)
+        self.route_time += time.perf_counter() - started
+        self.turns += 1
+        if routed is None:
+            self.counts[LLM] += 1
+            return None
+        intent, reply = routed
+        kind = INTENTS[intent][0] if intent in INTENTS else SCRIPT
+        self.counts[kind] += 1
+        self.intents[intent] = self.intents.get(intent, 0) + 1
+        self.time_saved += self.llm_seconds
+        return chunk_reply(reply)
+
+    def stats(self):
+        return {
+            **self.counts,
+            'intents': dict(self.intents),
+            'time_saved': self.time_saved,
+            'avg_route_us': 1e6 * self.route_time / self.turns if self.turns else 0.0,
+        }
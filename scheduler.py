@@ -0,0 +1,331 @@
+import asyncio
+import itertools
+import threading
+import time
+
+from stt import backoff_delay
+
+# ------------ LLM REQUEST SCHEDULER ------------
+# Every chat completion in the process goes through one scheduler per API key.
+# Requests wait for room in two token buckets sized to the org's requests- and
+# tokens-per-minute limits; when several calls are waiting, the call that has
+# used the least recently goes first, so one chatty call can't starve the
+# rest. A stream that fails before its first token is retried with jittered
+# exponential backoff. Repeated failures open a circuit breaker, and while it
+# is open (or a request has waited too long) callers get Overloaded at once
+# and answer with FALLBACK_REPLY instead of dropping the turn.
+LLM_RPM = 500
+LLM_TPM = 200000
+LLM_MAX_QUEUE_WAIT = 8.0
+LLM_RETRIES = 3
+LLM_RETRY_BASE = 0.5
+LLM_RETRY_MAX = 4.0
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN = 30.0
+USAGE_HALF_LIFE = 60.0   # seconds for a call's recent usage to count half as much
+USAGE_FLOOR = 1.0        # decayed usage below this many tokens is forgotten
+POLL_INTERVAL = 0.02
+FALLBACK_REPLY = ("One moment please, I'm having a little trouble pulling that up. "
+                  "Could you give me a few seconds and say that again?")
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class Overloaded(Exception):
+    pass
+
+class TokenBucket:
+    # rate per second, up to `capacity` banked. A request bigger than the
+    # bucket waits for a full bucket and then borrows against the future.
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self, amount, now):
+        # Seconds until `amount` can be taken
+        self._refill(now)
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def give_back(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+class CircuitBreaker:
+    # Opens after `failures` failed requests in a row; after `cooldown` one
+    # probe request is let through, and its outcome closes or re-opens the
+    # circuit. A probe abandoned without an outcome is released, and the next
+    # request probes in its place.
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def rejecting(self, now):
+        return self.state == OPEN and now - self.opened_at < self.cooldown
+
+    def allow(self, now):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            return True
+        return False
+
+    def success(self):
+        self.state = CLOSED
+        self.consecutive = 0
+
+    def failure(self, now):
+        self.consecutive += 1
+        if self.state == HALF_OPEN or self.consecutive >= self.failures:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = now
+
+    def release(self):
+        if self.state == HALF_OPEN:
+            self.state = OPEN   # cooldown already served: allow() probes again at once
+
+class Ticket:
+    __slots__ = ('seq', 'session_id', 'cost', 'created', 'retry')
+
+    def __init__(self, seq, session_id, cost, retry=False):
+        self.seq = seq
+        self.session_id = session_id
+        self.cost = cost
+        self.created = time.monotonic()
+        self.retry = retry   # a retry belongs to a request the breaker already let through
+
+class LLMScheduler:
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, max_queue_wait=LLM_MAX_QUEUE_WAIT, retries=LLM_RETRIES,
+                 retry_base=LLM_RETRY_BASE, retry_max=LLM_RETRY_MAX, breaker=None):
+        # rpm / tpm of 0 turn that limit off
+        self.requests = TokenBucket(rpm / 60, max(1.0, rpm / 60)) if rpm else None
+        self.tokens = TokenBucket(tpm / 60, max(1.0, tpm / 60)) if tpm else None
+        self.max_queue_wait = max_queue_wait
+        self.retries = retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.breaker = breaker or CircuitBreaker()
+        self.waiting = {}
+        self.usage = {}   # session_id -> (decayed tokens admitted, as of)
+        self.admitted = 0
+        self.retried = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self._pruned = time.monotonic()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    # ---- admission ----
+    def enqueue(self, session_id, cost, retry=False):
+        with self._lock:
+            if not retry and self.breaker.rejecting(time.monotonic()):
+                self.rejected += 1
+                raise Overloaded("LLM circuit open")
+            ticket = Ticket(next(self._seq), session_id, cost, retry)
+            self.waiting[ticket.seq] = ticket
+            return ticket
+
+    def cancel(self, ticket):
+        with self._lock:
+            self.waiting.pop(ticket.seq, None)
+
+    def _usage(self, session_id, now):
+        used, at = self.usage.get(session_id, (0.0, now))
+        return used * 0.5 ** ((now - at) / USAGE_HALF_LIFE)
+
+    def admit(self, ticket):
+        # 0.0 once the request may go, else how long to wait before asking again
+        with self._lock:
+            now = time.monotonic()
+            if now - ticket.created > self.max_queue_wait:
+                self.waiting.pop(ticket.seq, None)
+                self.timeouts += 1
+                raise Overloaded(f"LLM request waited over {self.max_queue_wait:.0f}s")
+            first = min(self.waiting.values(), key=lambda t: (self._usage(t.session_id, now), t.seq))
+            if first is not ticket:
+                return POLL_INTERVAL
+            delay = max(self.requests.delay(1, now) if self.requests else 0.0,
+                        self.tokens.delay(ticket.cost, now) if self.tokens else 0.0)
+            if delay > 0:
+                return min(delay, self.max_queue_wait)
+            if not ticket.retry and not self.breaker.allow(now):
+                self.waiting.pop(ticket.seq, None)
+                self.rejected += 1
+                raise Overloaded("LLM circuit open")
+            del self.waiting[ticket.seq]
+            if self.requests:
+                self.requests.take(1, now)
+            if self.tokens:
+                self.tokens.take(ticket.cost, now)
+            self.usage[ticket.session_id] = (self._usage(ticket.session_id, now) + ticket.cost, now)
+            if now - self._pruned >= USAGE_HALF_LIFE:
+                # Ended calls would otherwise stay in the dict for the life of the process
+                self._pruned = now
+                for session_id in [s for s in self.usage if self._usage(s, now) < USAGE_FLOOR]:
+                    del self.usage[session_id]
+            self.admitted += 1
+            self.wait_total += now - ticket.created
+            return 0.0
+
+    def settle(self, ticket, used):
+        # Returns the unused part of the estimate once the real size is known
+        with self._lock:
+            if self.tokens and used < ticket.cost:
+                self.tokens.give_back(ticket.cost - used)
+
+    def conclude(self, outcome, produced):
+        # One breaker verdict per admitted request, whatever its retries did.
+        # outcome is True / False, or None when the consumer stopped reading:
+        # that says nothing about the upstream beyond the tokens it did send.
+        with self._lock:
+            if outcome or (outcome is None and produced):
+                self.breaker.success()
+            elif outcome is None:
+                self.breaker.release()
+            else:
+                self.breaker.failure(time.monotonic())
+
+    def retry_delay(self, attempt):
+        self.retried += 1
+        return backoff_delay(attempt - 1, self.retry_base, self.retry_max)
+
+    # ---- streaming ----
+    def stream(self, session_id, prompt_tokens, start, max_tokens=0):
+        # Yields from start() (a fresh content-delta iterator per attempt) once
+        # admitted; retries only while nothing has been yielded
+        cost = prompt_tokens + max_tokens
+        attempt = produced = 0
+        admitted = False
+        outcome = taken = None   # taken: the admitted ticket whose estimate is still out
+        try:
+            while True:
+                ticket = self.enqueue(session_id, cost, retry=admitted)
+                try:
+                    while True:
+                        delay = self.admit(ticket)
+                        if not delay:
+                            break
+                        time.sleep(delay)
+                finally:
+                    self.cancel(ticket)
+                admitted = True
+                taken = ticket
+                produced = 0
+                try:
+                    for content in start():
+                        produced += 1
+                        yield content
+                except Exception:
+                    if produced or attempt >= self.retries:
+                        raise
+                    self.settle(ticket, prompt_tokens)
+                    taken = None
+                    attempt += 1
+                    time.sleep(self.retry_delay(attempt))
+                    continue
+                outcome = True
+                return
+        except Exception:
+            outcome = False
+            raise
+        finally:
+            # Also runs when the consumer closes the stream (GeneratorExit)
+            if taken is not None:
+                self.settle(taken, prompt_tokens + produced)
+            if admitted:
+                self.conclude(outcome, produced)
+
+    async def astream(self, session_id, prompt_tokens, start, max_tokens=0):
+        # Same as stream() for a start() that returns an async iterator
+        cost = prompt_tokens + max_tokens
+        attempt = produced = 0
+        admitted = False
+        outcome = taken = None   # taken: the admitted ticket whose estimate is still out
+        try:
+            while True:
+                ticket = self.enqueue(session_id, cost, retry=admitted)
+                try:
+                    while True:
+                        delay = self.admit(ticket)
+                        if not delay:
+                            break
+                        await asyncio.sleep(delay)
+                finally:
+                    self.cancel(ticket)
+                admitted = True
+                taken = ticket
+                produced = 0
+                try:
+                    async for content in start():
+                        produced += 1
+                        yield content
+                except Exception:
+                    if produced or attempt >= self.retries:
+                        raise
+                    self.settle(ticket, prompt_tokens)
+                    taken = None
+                    attempt += 1
+                    await asyncio.sleep(self.retry_delay(attempt))
+                    continue
+                outcome = True
+                return
+        except Exception:
+            outcome = False
+            raise
+        finally:
+            # Also runs when the reply task is cancelled or the stream is closed
+            if taken is not None:
+                self.settle(taken, prompt_tokens + produced)
+            if admitted:
+                self.conclude(outcome, produced)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'admitted': self.admitted,
+                'waiting': len(self.waiting),
+                'retried': self.retried,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'breaker': self.breaker.state,
+                'breaker_trips': self.breaker.trips,
+                'avg_wait': self.wait_total / self.admitted if self.admitted else 0.0,
+            }
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(config):
+    # One per process and API key, shared by every call like the LLM client
+    key = config.get('openai_api_key')
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = LLMScheduler(
+                rpm=config.get('llm_rpm', LLM_RPM),
+                tpm=config.get('llm_tpm', LLM_TPM),
+                max_queue_wait=config.get('llm_max_queue_wait', LLM_MAX_QUEUE_WAIT),
+                retries=config.get('llm_retries', LLM_RETRIES),
+                breaker=CircuitBreaker(config.get('llm_breaker_failures', BREAKER_FAILURES),
+                                       config.get('llm_breaker_cooldown', BREAKER_COOLDOWN)),
+            )
+            _schedulers[key] = scheduler
+        return scheduler
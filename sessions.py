@@ -0,0 +1,143 @@
+import itertools
+import queue
+import threading
+
+from engine import PipelineEngine
+
+# ------------ MULTI-SESSION MODE ------------
+# Many concurrent calls in one process. Each call is its own engine (audio,
+# STT connection, history, stats); all of them share the pooled LLM client,
+# the response cache and a single event dispatcher thread, and admission is
+# capped so an overloaded host refuses new calls instead of degrading all of them.
+MAX_SESSIONS = 8
+DISPATCH_QUEUE_SIZE = 10000
+
+class SessionRejected(Exception):
+    pass
+
+class EventDispatcher:
+    # Subscribers are called as callback(session_id, event, *args) on the dispatcher thread
+    def __init__(self, maxsize=DISPATCH_QUEUE_SIZE):
+        self._q = queue.Queue(maxsize)
+        self._subscribers = []
+        self._thread = None
+        self.dropped = 0
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def forwarder(self, session_id):
+        # Engine subscriber that moves events off the call's worker threads
+        def forward(event, *args):
+            self.publish(session_id, event, args)
+        return forward
+
+    def publish(self, session_id, event, args=()):
+        try:
+            self._q.put_nowait((session_id, event, args))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='event-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def run(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            session_id, event, args = item
+            for callback in list(self._subscribers):
+                try:
+                    callback(session_id, event, *args)
+                except Exception as e:
+                    print(f"Dispatcher subscriber error ({event}): {e}")
+
+class SessionManager:
+    def __init__(self, config, capacity=None, dispatcher=None):
+        self.config = config
+        self.capacity = capacity or config.get('max_sessions', MAX_SESSIONS)
+        self.dispatcher = dispatcher or EventDispatcher()
+        self.dispatcher.start()
+        self.sessions = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.runtime = None
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+
+    @property
+    def active(self):
+        return len(self.sessions)
+
+    def open_session(self, session_id=None, timeout=0, config=None, **engine_kwargs):
+        # Reserves a slot (waiting up to `timeout` seconds) and returns an unstarted engine
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self.sessions) < self.capacity, timeout=timeout):
+                self.rejected += 1
+                raise SessionRejected(f"At capacity ({self.capacity} sessions)")
+            if session_id is None:
+                session_id = f"call-{next(self._ids)}"
+            if session_id in self.sessions:
+                raise ValueError(f"Session {session_id} already exists")
+            session_config = dict(self.config, **(config or {}))
+            engine = self._create_engine(session_config, **engine_kwargs)
+            engine.session_id = session_id
+            engine.tracer.session_id = session_id
+            engine.subscribe(self.dispatcher.forwarder(session_id))
+            self.sessions[session_id] = engine
+            self.admitted += 1
+        self.dispatcher.publish(session_id, 'session_opened')
+        return engine
+
+    def _create_engine(self, config, **engine_kwargs):
+        if config.get('runtime') == 'asyncio':
+            if self.runtime is None:
+                from async_runtime import AsyncRuntime
+                self.runtime = AsyncRuntime()
+            return self.runtime.create_session(config, **engine_kwargs)
+        return PipelineEngine(config, **engine_kwargs)
+
+    def close_session(self, session_id):
+        with self._cond:
+            engine = self.sessions.pop(session_id, None)
+            self._cond.notify()
+        if engine is None:
+            return False
+        engine.stop()
+        if self.runtime is not None and engine in self.runtime.sessions:
+            self.runtime.sessions.remove(engine)
+        self.dispatcher.publish(session_id, 'session_closed')
+        return True
+
+    def get(self, session_id):
+        return self.sessions.get(session_id)
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'capacity': self.capacity,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'events_dropped': self.dispatcher.dropped,
+        }
+
+    def shutdown(self):
+        for session_id in list(self.sessions):
+            self.close_session(session_id)
+        self.dispatcher.stop()
+        if self.runtime is not None:
+            self.runtime.shutdown()
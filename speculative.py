@@ -0,0 +1,150 @@
+import re
+import threading
+
+# ------------ SPECULATIVE GENERATION ------------
+# Starts the LLM on a partial transcript once it has stopped changing for
+# `stable_ms`. If the final end-of-turn transcript says the same thing, the
+# tokens generated so far are replayed at once and the rest stream live;
+# otherwise the in-flight request is cancelled and counted as wasted.
+SPECULATIVE_STABLE_MS = 300
+
+_NORMALIZE_RE = re.compile(r"[^\w\s]")
+
+def normalize_transcript(text):
+    # Partials are unformatted and finals are formatted, so compare without case or punctuation
+    return " ".join(_NORMALIZE_RE.sub("", text.lower()).split())
+
+class Speculation:
+    def __init__(self, text, messages):
+        self.text = text
+        self.key = normalize_transcript(text)
+        self.context = messages[:-1]
+        self.messages = messages
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.cancelled = threading.Event()
+        self._cond = threading.Condition()
+
+    def matches(self, text, messages):
+        return self.key == normalize_transcript(text) and self.context == messages[:-1]
+
+    def push(self, token):
+        with self._cond:
+            self.tokens.append(token)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def stream(self):
+        # Buffered tokens first, then live ones until generation finishes
+        i = 0
+        done = False
+        try:
+            while True:
+                with self._cond:
+                    while i >= len(self.tokens) and not self.done:
+                        self._cond.wait()
+                    pending = self.tokens[i:]
+                    i = len(self.tokens)
+                    done = self.done
+                    error = self.error
+                yield from pending
+                if done:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            if not done:
+                self.cancelled.set()   # closed early (barge-in): stop generating the rest
+
+class Speculator:
+    def __init__(self, engine, stream_fn, stable_ms=SPECULATIVE_STABLE_MS):
+        # stream_fn(messages, cancelled) yields content strings and stops early once cancelled is set
+        self.engine = engine
+        self.stream_fn = stream_fn
+        self.stable_ms = stable_ms
+        self.current = None
+        self.hits = 0
+        self.misses = 0
+        self.wasted_tokens = 0
+        self._timer = None
+        self._partial = None
+        self._lock = threading.Lock()
+
+    def observe_partial(self, text):
+        # Called for every non-final Turn; (re)arms the stability timer when the text changes
+        key = normalize_transcript(text)
+        with self._lock:
+            if self._partial is not None and key == normalize_transcript(self._partial):
+                return
+            self._partial = text
+            if self.current is not None and self.current.key != key:
+                self._discard()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.stable_ms / 1000, self._fire, args=(text,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self, text):
+        with self._lock:
+            if text != self._partial or self.current is not None:
+                return
+            spec = Speculation(text, self.engine.preview_messages(text))
+            self.current = spec
+        threading.Thread(target=self._generate, args=(spec,), daemon=True).start()
+
+    def _generate(self, spec):
+        try:
+            for token in self.stream_fn(spec.messages, spec.cancelled):
+                if spec.cancelled.is_set():
+                    break
+                spec.push(token)
+            spec.finish()
+        except Exception as e:
+            spec.finish(e)
+
+    def claim(self, text, messages):
+        # Called with the final transcript; returns a token iterator on a hit, else None
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._partial = None
+            spec, self.current = self.current, None
+            if spec is None:
+                return None
+            if spec.matches(text, messages) and spec.error is None:
+                self.hits += 1
+                self._report()
+                return spec.stream()
+            self.current = spec
+            self._discard()
+            return None
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._partial = None
+            if self.current is not None:
+                self._discard()
+
+    def _discard(self):
+        # Called with the lock held
+        spec, self.current = self.current, None
+        spec.cancelled.set()
+        self.misses += 1
+        self.wasted_tokens += len(spec.tokens)
+        self._report()
+
+    def _report(self):
+        self.engine.set_stat('spec_hits', self.hits)
+        self.engine.set_stat('spec_misses', self.misses)
+        self.engine.set_stat('spec_wasted_tokens', self.wasted_tokens)
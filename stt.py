@@ -0,0 +1,154 @@
+import json
+import random
+import threading
+import time
+
+# ------------ STT SESSION MANAGER ------------
+# Owns the AssemblyAI v3 WebSocket for one call. A dropped connection is
+# re-established with exponential backoff and jitter instead of ending the
+# call; audio captured meanwhile stays in the engine's ring buffer and is
+# replayed by the next sender. stop() never blocks the caller.
+STT_BACKOFF_BASE = 0.5
+STT_BACKOFF_MAX = 15.0
+STT_TERMINATE_TIMEOUT = 1.0
+STT_PING_INTERVAL = 20
+STT_PING_TIMEOUT = 10
+
+def backoff_delay(attempt, base=STT_BACKOFF_BASE, cap=STT_BACKOFF_MAX):
+    # Equal jitter: half the exponential delay is fixed, the other half random
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class STTSession:
+    def __init__(self, url, api_key, on_open=None, on_message=None, on_error=None, on_state=None,
+                 backoff_base=STT_BACKOFF_BASE, backoff_max=STT_BACKOFF_MAX, max_retries=None):
+        self.url = url
+        self.api_key = api_key
+        self.on_open = on_open
+        self.on_message = on_message
+        self.on_error = on_error
+        self.on_state = on_state
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retries = max_retries
+        self.ws = None
+        self.connected = False
+        self.attempt = 0
+        self.reconnects = 0
+        self.outages = []  # seconds per outage that ended in a reconnect
+        self._outage_started = None
+        self._stopping = threading.Event()
+        self._terminated = threading.Event()
+        self._thread = None
+
+    # ---- metrics ----
+    @property
+    def outage_total(self):
+        return sum(self.outages)
+
+    def metrics(self):
+        return {
+            'reconnects': self.reconnects,
+            'outages': len(self.outages),
+            'outage_total': round(self.outage_total, 3),
+            'outage_max': round(max(self.outages), 3) if self.outages else 0.0,
+            'in_outage': self._outage_started is not None,
+        }
+
+    # ---- lifecycle ----
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        # Ask the server to flush the final turn, then close from a helper thread
+        self._stopping.set()
+        ws = self.ws
+        if ws is not None:
+            threading.Thread(target=self._shutdown, args=(ws,), daemon=True).start()
+
+    def _shutdown(self, ws):
+        try:
+            if ws.sock and ws.sock.connected:
+                ws.send(json.dumps({"type": "Terminate"}))
+                self._terminated.wait(STT_TERMINATE_TIMEOUT)
+        except Exception:
+            pass
+        try:
+            ws.close()
+        except Exception:
+            pass
+
+    def backoff_delay(self, attempt):
+        return backoff_delay(attempt, self.backoff_base, self.backoff_max)
+
+    def run(self):
+        import websocket
+        while not self._stopping.is_set():
+            self._terminated.clear()
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                header=[f"Authorization: {self.api_key}"],
+                on_open=self._handle_open,
+                on_message=self._handle_message,
+                on_error=self._handle_error,
+                on_close=self._handle_close
+            )
+            try:
+                self.ws.run_forever(ping_interval=STT_PING_INTERVAL, ping_timeout=STT_PING_TIMEOUT)
+            except Exception as e:
+                self._handle_error(self.ws, e)
+            self.connected = False
+            if self._stopping.is_set():
+                break
+
+            if self._outage_started is None:
+                self._outage_started = time.monotonic()
+            if self.max_retries is not None and self.attempt >= self.max_retries:
+                self._set_state('failed')
+                break
+            delay = self.backoff_delay(self.attempt)
+            self.attempt += 1
+            self._set_state('reconnecting', delay)
+            self._stopping.wait(delay)
+        if self._stopping.is_set():
+            self._set_state('closed')
+
+    # ---- websocket callbacks ----
+    def _set_state(self, state, *args):
+        if self.on_state is not None:
+            self.on_state(state, *args)
+
+    def _handle_open(self, ws):
+        if self._stopping.is_set():
+            # stop() raced with the handshake
+            ws.close()
+            return
+        self.connected = True
+        self.attempt = 0
+        if self._outage_started is not None:
+            self.outages.append(time.monotonic() - self._outage_started)
+            self._outage_started = None
+            self.reconnects += 1
+        self._set_state('connected')
+        if self.on_open is not None:
+            self.on_open(ws)
+
+    def _handle_message(self, ws, message):
+        if '"Termination"' in message:
+            self._terminated.set()
+        if self.on_message is not None:
+            self.on_message(ws, message)
+
+    def _handle_error(self, ws, error):
+        if self._stopping.is_set():
+            return
+        if self.on_error is not None:
+            self.on_error(ws, error)
+
+    def _handle_close(self, ws, status_code, msg):
+        print(f"WebSocket closed: Status={status_code}, Msg={msg}")
+        self.connected = False
+        self._terminated.set()
@@ -0,0 +1,458 @@
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+from sessions import SessionRejected
+from tracing import STAGES, format_quantiles, quantiles
+
+# ------------ PROCESS-POOL SUPERVISOR ------------
+# Spreads call sessions over worker processes, one per core by default, so
+# the JSON parsing, audio processing and LLM streaming of different calls stop
+# competing for one GIL. Each worker runs its own SessionManager. The
+# supervisor sends new calls to the least-loaded worker, restarts workers that
+# die and reopens their calls elsewhere, and merges the per-process stats.
+STATS_INTERVAL = 1.0
+MONITOR_INTERVAL = 0.5
+SESSIONS_PER_WORKER = 16
+TTFT_SAMPLES = 200  # newest samples each session reports per interval
+
+# ------------ WORKER PROCESS ------------
+def session_snapshot(engine):
+    vad = engine.vad
+    averages = engine.llm_metrics.average
+    return {
+        'running': engine.is_running,
+        'responses': engine.stats.get('responses', 0),
+        'reconnects': engine.stats.get('reconnects', 0),
+        'ttft': [s['ttft'] for s in list(engine.llm_metrics.recent)[-TTFT_SAMPLES:]],
+        'latency': averages.get('total'),
+        'generation': averages.get('generation'),
+        'tokens_per_sec': averages.get('tokens_per_sec'),
+        'frames_in': vad.frames_in if vad is not None else 0,
+        'frames_suppressed': vad.frames_suppressed if vad is not None else 0,
+        'stages': {name: list(w.values)[-TTFT_SAMPLES:] for name, w in engine.tracer.stages.items()},
+        'capture': dict(engine.capture_stats),
+        'router': engine.router.stats() if engine.router is not None else {},
+        'case_notes': engine.case_notes,
+    }
+
+def worker_snapshot(manager):
+    sessions = dict(manager.sessions)
+    caches = {id(e.cache): e.cache for e in sessions.values() if e.cache is not None}
+    return {
+        'pid': os.getpid(),
+        'cpu': time.process_time(),
+        'sessions': {sid: session_snapshot(e) for sid, e in sessions.items()},
+        'cache_hits': sum(c.hits for c in caches.values()),
+        'cache_misses': sum(c.misses for c in caches.values()),
+        'time_saved': sum(c.time_saved for c in caches.values()),
+        'events_dropped': manager.dispatcher.dropped,
+    }
+
+def worker_main(worker_id, config, commands, results, stats_interval=STATS_INTERVAL):
+    from sessions import SessionManager
+    manager = SessionManager(config, capacity=config.get('sessions_per_worker', SESSIONS_PER_WORKER))
+    manager.dispatcher.subscribe(lambda session_id, event, *args: results.put(('event', worker_id, session_id, event, args)))
+    results.put(('ready', worker_id, os.getpid()))
+
+    next_report = time.monotonic()
+    while True:
+        try:
+            command = commands.get(timeout=max(0.0, next_report - time.monotonic()))
+        except queue.Empty:
+            command = None
+        if command is not None:
+            op, session_id, *args = command
+            if op == 'shutdown':
+                break
+            try:
+                if op == 'open':
+                    session_config, engine_kwargs, start_kwargs = args
+                    start_kwargs = dict(start_kwargs)
+                    engine = manager.open_session(session_id, config=session_config, **engine_kwargs)
+                    if start_kwargs.get('device_index') is not None:
+                        engine.device_index = start_kwargs['device_index']
+                    start_kwargs.pop('device_index', None)
+                    engine.start(**start_kwargs)
+                elif op == 'close':
+                    manager.close_session(session_id)
+                elif op == 'text':
+                    manager.sessions[session_id].submit_text(args[0])
+                elif op == 'audio':
+                    manager.sessions[session_id].feed_audio(args[0])
+            except Exception as e:
+                results.put(('event', worker_id, session_id, 'worker_error', (f"{op}: {e}",)))
+        if time.monotonic() >= next_report:
+            results.put(('stats', worker_id, worker_snapshot(manager)))
+            next_report = time.monotonic() + stats_interval
+    manager.shutdown()
+    results.put(('stats', worker_id, worker_snapshot(manager)))
+
+# ------------ AGGREGATED STATS ------------
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+def aggregate_stats(snapshots):
+    # One view over every worker's last report
+    sessions = [s for snap in snapshots for s in snap.get('sessions', {}).values()]
+    ttfts = [t for s in sessions for t in s['ttft']]
+    frames_in = sum(s['frames_in'] for s in sessions)
+    hits = sum(snap.get('cache_hits', 0) for snap in snapshots)
+    lookups = hits + sum(snap.get('cache_misses', 0) for snap in snapshots)
+    return {
+        'workers': len(snapshots),
+        'sessions': len(sessions),
+        'responses': sum(s['responses'] for s in sessions),
+        'reconnects': sum(s['reconnects'] for s in sessions),
+        'ttft_p50': percentile(ttfts, 50),
+        'ttft_p95': percentile(ttfts, 95),
+        'ttft_p99': percentile(ttfts, 99),
+        'latency': _mean(s['latency'] for s in sessions),
+        'generation': _mean(s['generation'] for s in sessions),
+        'tokens_per_sec': _mean(s['tokens_per_sec'] for s in sessions),
+        'suppressed': sum(s['frames_suppressed'] for s in sessions) / frames_in if frames_in else None,
+        'cache_hits': hits,
+        'cache_hit_rate': hits / lookups if lookups else 0.0,
+        'time_saved': sum(snap.get('time_saved', 0.0) for snap in snapshots),
+        'cpu_pct': sum(snap.get('cpu_pct', 0.0) for snap in snapshots),
+        'events_dropped': sum(snap.get('events_dropped', 0) for snap in snapshots),
+        'stages': {name: quantiles([v for s in sessions for v in s['stages'].get(name, ())]) for name, _, _ in STAGES},
+        'capture_glitches': sum(s['capture'].get('overflows', 0) + s['capture'].get('late', 0) for s in sessions),
+        'capture_jitter': max((s['capture']['jitter_p95_ms'] for s in sessions
+                               if s['capture'].get('jitter_p95_ms') is not None), default=None),
+        'routed_deflect': sum(s['router'].get('deflect', 0) for s in sessions),
+        'routed_script': sum(s['router'].get('script', 0) for s in sessions),
+        'routed_llm': sum(s['router'].get('llm', 0) for s in sessions),
+        'router_saved': sum(s['router'].get('time_saved', 0.0) for s in sessions),
+        'case_notes': sum(s.get('case_notes', 0) for s in sessions),
+    }
+
+def format_stats(aggregate):
+    # Same keys and formats as the StatsPanel's per-call values
+    def seconds(value, fmt):
+        return '-' if value is None else f"{value:{fmt}}s"
+    values = {
+        'responses': aggregate['responses'],
+        'latency': seconds(aggregate['latency'], '.1f'),
+        'suppressed': '-' if aggregate['suppressed'] is None else f"{aggregate['suppressed']:.0%}",
+        'cache': f"{aggregate['cache_hit_rate']:.0%} ({aggregate['cache_hits']})",
+        'time_saved': f"{aggregate['time_saved']:.1f}s",
+        'ttft': seconds(aggregate['ttft_p95'], '.2f') + (' p95' if aggregate['ttft_p95'] is not None else ''),
+        'tokens_per_sec': '-' if aggregate['tokens_per_sec'] is None else f"{aggregate['tokens_per_sec']:.0f}",
+        'gen_time': seconds(aggregate['generation'], '.1f'),
+        'capture_glitches': aggregate['capture_glitches'],
+        'capture_jitter': '-' if aggregate['capture_jitter'] is None else f"{aggregate['capture_jitter']:.1f}ms worst p95",
+        'router': (f"{aggregate['routed_deflect']} deflected / {aggregate['routed_script']} scripted / "
+                   f"{aggregate['routed_llm']} to LLM"),
+        'router_saved': f"{aggregate['router_saved']:.1f}s",
+        'case_notes': f"{aggregate['case_notes']} filed",
+    }
+    for stage in ('stt', 'ttft', 'sentence', 'render', 'e2e'):
+        values[f'stage_{stage}'] = format_quantiles(aggregate['stages'].get(stage))
+    return values
+
+# ------------ SUPERVISOR ------------
+class WorkerHandle:
+    def __init__(self, worker_id, process, commands):
+        self.worker_id = worker_id
+        self.process = process
+        self.commands = commands
+        self.sessions = set()
+        self.snapshot = {}
+        self.restarts = 0
+        self._cpu = None
+
+    def record(self, snapshot):
+        now = time.monotonic()
+        if self._cpu is not None and now > self._cpu[1]:
+            snapshot['cpu_pct'] = 100 * (snapshot['cpu'] - self._cpu[0]) / (now - self._cpu[1])
+        self._cpu = (snapshot['cpu'], now)
+        self.snapshot = snapshot
+
+    @property
+    def load(self):
+        return (len(self.sessions), self.snapshot.get('cpu_pct', 0.0))
+
+class Supervisor:
+    # Subscribers are called as callback(session_id, event, *args) on the collector thread
+    def __init__(self, config, workers=None):
+        self.config = config
+        self.num_workers = workers or config.get('workers') or os.cpu_count() or 1
+        self.per_worker = config.get('sessions_per_worker', SESSIONS_PER_WORKER)
+        self._ctx = mp.get_context('spawn')
+        self._results = self._ctx.Queue()
+        self.workers = {}
+        self.specs = {}       # session_id -> (config, engine kwargs, start kwargs), kept for reopening after a crash
+        self.placement = {}   # session_id -> worker_id
+        self.restarts = 0
+        self.moved = 0
+        self.rejected = 0
+        self._subscribers = []
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def publish(self, session_id, event, *args):
+        for callback in list(self._subscribers):
+            try:
+                callback(session_id, event, *args)
+            except Exception as e:
+                print(f"Supervisor subscriber error ({event}): {e}")
+
+    # ---- lifecycle ----
+    def start(self):
+        for worker_id in range(self.num_workers):
+            self.workers[worker_id] = self._spawn(worker_id)
+        for target in (self._collect, self._monitor):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _spawn(self, worker_id):
+        commands = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=worker_main, args=(worker_id, self._worker_config(), commands, self._results),
+            name=f'call-worker-{worker_id}', daemon=True
+        )
+        process.start()
+        return WorkerHandle(worker_id, process, commands)
+
+    def _worker_config(self):
+        # Every worker has its own LLM scheduler, so each gets an even share of the org limits
+        from scheduler import LLM_RPM, LLM_TPM
+        config = dict(self.config)
+        for key, default in (('llm_rpm', LLM_RPM), ('llm_tpm', LLM_TPM)):
+            config[key] = config.get(key, default) / self.num_workers
+        return config
+
+    def shutdown(self, timeout=5.0):
+        self._stopping.set()
+        with self._lock:
+            handles = list(self.workers.values())
+            self.specs.clear()
+            self.placement.clear()
+        for handle in handles:
+            handle.commands.put(('shutdown', None))
+        deadline = time.monotonic() + timeout
+        for handle in handles:
+            handle.process.join(max(0.0, deadline - time.monotonic()))
+            if handle.process.is_alive():
+                handle.process.terminate()
+        self._results.put(None)
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+
+    # ---- sessions ----
+    def _least_loaded(self):
+        candidates = [h for h in self.workers.values() if h.process.is_alive() and len(h.sessions) < self.per_worker]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda h: h.load)
+
+    def open_session(self, session_id=None, config=None, engine_kwargs=None, **start_kwargs):
+        # Places a call on the least-loaded worker and starts it there; returns its id.
+        # engine_kwargs (e.g. a stand-in llm_client) must be picklable.
+        with self._lock:
+            handle = self._least_loaded()
+            if handle is None:
+                self.rejected += 1
+                raise SessionRejected(f"At capacity ({self.num_workers} workers x {self.per_worker} sessions)")
+            if session_id is None:
+                session_id = f"call-{next(self._ids)}"
+            if session_id in self.placement:
+                raise ValueError(f"Session {session_id} already exists")
+            self.specs[session_id] = (config or {}, engine_kwargs or {}, start_kwargs)
+            self._place(session_id, handle)
+        return session_id
+
+    def _place(self, session_id, handle):
+        handle.sessions.add(session_id)
+        self.placement[session_id] = handle.worker_id
+        handle.commands.put(('open', session_id, *self.specs[session_id]))
+
+    def close_session(self, session_id):
+        with self._lock:
+            worker_id = self.placement.pop(session_id, None)
+            self.specs.pop(session_id, None)
+            if worker_id is None:
+                return False
+            handle = self.workers[worker_id]
+            handle.sessions.discard(session_id)
+        handle.commands.put(('close', session_id))
+        return True
+
+    def submit_text(self, session_id, text):
+        self._send(session_id, ('text', session_id, text))
+
+    def feed_audio(self, session_id, data):
+        self._send(session_id, ('audio', session_id, bytes(data)))
+
+    def _send(self, session_id, command):
+        with self._lock:
+            worker_id = self.placement.get(session_id)
+            if worker_id is None:
+                raise KeyError(session_id)
+            self.workers[worker_id].commands.put(command)
+
+    # ---- worker traffic ----
+    def _collect(self):
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            kind, worker_id, *rest = item
+            if kind == 'event':
+                session_id, event, args = rest
+                self.publish(session_id, event, *args)
+            elif kind == 'stats':
+                with self._lock:
+                    handle = self.workers.get(worker_id)
+                    if handle is not None and handle.process.pid == rest[0]['pid']:
+                        handle.record(rest[0])
+
+    def _monitor(self):
+        while not self._stopping.wait(MONITOR_INTERVAL):
+            with self._lock:
+                dead = [h for h in self.workers.values() if not h.process.is_alive()]
+                for handle in dead:
+                    if not self._stopping.is_set():
+                        self._restart(handle)
+
+    def _restart(self, handle):
+        # Replace the dead process, then spread its calls over the whole pool
+        print(f"Worker {handle.worker_id} exited ({handle.process.exitcode}), restarting")
+        fresh = self._spawn(handle.worker_id)
+        fresh.restarts = handle.restarts + 1
+        self.workers[handle.worker_id] = fresh
+        self.restarts += 1
+        self.publish(None, 'worker_restarted', handle.worker_id)
+        for session_id in sorted(handle.sessions):
+            target = self._least_loaded()
+            if target is None:
+                self.placement.pop(session_id, None)
+                self.specs.pop(session_id, None)
+                self.publish(session_id, 'status', 'error')
+                self.publish(session_id, 'stopped')   # the call is gone; let the UI and dispatcher let go of it
+                continue
+            self._place(session_id, target)
+            self.moved += 1
+            self.publish(session_id, 'session_moved', handle.worker_id, target.worker_id)
+
+    def stats(self):
+        with self._lock:
+            snapshots = [h.snapshot for h in self.workers.values() if h.snapshot]
+            workers = [{
+                'worker': h.worker_id,
+                'pid': h.process.pid,
+                'alive': h.process.is_alive(),
+                'sessions': len(h.sessions),
+                'cpu_pct': round(h.snapshot.get('cpu_pct', 0.0), 1),
+                'restarts': h.restarts,
+            } for h in self.workers.values()]
+        aggregate = aggregate_stats(snapshots)
+        aggregate.update(workers=len(workers), placed=len(self.placement),
+                         restarts=self.restarts, moved=self.moved, rejected=self.rejected, per_worker=workers)
+        return aggregate
+
+# ------------ ENGINE-SHAPED HANDLE ------------
+class SupervisedSession:
+    # Lets the Tk app drive a call that runs in a worker process
+    def __init__(self, supervisor, config=None):
+        self.supervisor = supervisor
+        self.config = config or {}
+        self.device_index = self.config.get('device_index')
+        self.session_id = None
+        self._pa = None
+        self._subscribers = []
+        supervisor.subscribe(self._on_event)
+
+    @property
+    def audio_interface(self):
+        # Only used here to list devices; capture happens in the worker
+        if self._pa is None:
+            import pyaudio
+            self._pa = pyaudio.PyAudio()
+        return self._pa
+
+    @property
+    def is_running(self):
+        return self.session_id is not None and self.session_id in self.supervisor.placement
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def _on_event(self, session_id, event, *args):
+        if session_id is not None and session_id == self.session_id:
+            for callback in list(self._subscribers):
+                callback(event, *args)
+
+    def start(self, capture=True, stt=True):
+        if self.is_running:
+            return False
+        self.session_id = self.supervisor.open_session(device_index=self.device_index, capture=capture, stt=stt)
+        return True
+
+    def stop(self):
+        if not self.is_running:
+            return False
+        return self.supervisor.close_session(self.session_id)
+
+    def terminate(self):
+        self.stop()
+        self.supervisor.shutdown()
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+
+    def submit_text(self, text):
+        self.supervisor.submit_text(self.session_id, text)
+
+    def feed_audio(self, data):
+        self.supervisor.feed_audio(self.session_id, data)
+
+# ------------ CLI ------------
+def main():
+    import argparse
+    import json
+    from engine import load_config
+    parser = argparse.ArgumentParser(description="Run call sessions across a pool of worker processes")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds between stats lines")
+    args = parser.parse_args()
+
+    supervisor = Supervisor(load_config(), workers=args.workers).start()
+    print(f"Supervisor running {supervisor.num_workers} workers; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(args.interval)
+            stats = supervisor.stats()
+            stats.pop('per_worker')
+            print(json.dumps(stats))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.shutdown()
+
+if __name__ == '__main__':
+    main()
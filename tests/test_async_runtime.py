@@ -0,0 +1,85 @@
+import asyncio
+import socket
+import time
+
+from async_runtime import AsyncRuntime
+from benchmarks.servers import StandInSTTServer
+from benchmarks.standins import AsyncStandInLLM
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_stt_reconnects_after_first_connect_fails():
+    port = free_port()
+    config = {'openai_api_key': 'offline', 'assemblyai_api_key': 'offline', 'response_cache': False,
+              'case_archive': '', 'vad_enabled': False, 'stt_url': f"ws://127.0.0.1:{port}/v3/ws"}
+    runtime = AsyncRuntime()
+    session = runtime.create_session(config, llm_client=AsyncStandInLLM(ttft=0.0))
+    statuses = []
+    session.subscribe(lambda event, *args: statuses.append(args[0]) if event == 'status' else None)
+    server = None
+    try:
+        session.start(capture=False)
+        assert wait_for(lambda: 'reconnecting' in statuses)
+        server = StandInSTTServer(port=port).start()
+        assert wait_for(lambda: 'online' in statuses)
+        stt_task = session._tasks[0]
+        assert not stt_task.done()
+    finally:
+        runtime.shutdown()
+        if server is not None:
+            server.stop()
+
+def test_shutdown_leaves_no_pending_tasks():
+    server = StandInSTTServer().start()
+    config = {'openai_api_key': 'offline', 'assemblyai_api_key': 'offline', 'response_cache': False,
+              'case_archive': '', 'vad_enabled': False, 'stt_url': server.url}
+    runtime = AsyncRuntime()
+    session = runtime.create_session(config, llm_client=AsyncStandInLLM(ttft=0.0))
+    online = []
+    session.subscribe(lambda event, *args: online.append(1) if event == 'status' and args[0] == 'online' else None)
+    try:
+        session.start(capture=False)
+        assert wait_for(lambda: online)
+        loop = runtime.loop
+        runtime.shutdown()
+        assert not runtime._thread.is_alive()
+        assert not [task for task in asyncio.all_tasks(loop) if not task.done()]
+    finally:
+        server.stop()
+
+class RecordingLLM(AsyncStandInLLM):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.streams = []
+
+    async def create(self, **kwargs):
+        stream = await super().create(**kwargs)
+        self.streams.append(stream)
+        return stream
+
+def test_barge_in_closes_the_reply_stream():
+    config = {'openai_api_key': 'offline', 'assemblyai_api_key': 'offline', 'response_cache': False,
+              'case_archive': '', 'vad_enabled': False, 'intent_router': False}
+    runtime = AsyncRuntime()
+    llm = RecordingLLM(ttft=0.0, tokens_per_sec=20)
+    session = runtime.create_session(config, llm_client=llm)
+    try:
+        session.start(capture=False, stt=False)
+        session.submit_text("my icloud storage is full")
+        assert wait_for(lambda: session.stats.get('responses') == 1 and llm.streams)
+        time.sleep(0.2)
+        session.submit_text("actually it's about billing")
+        assert wait_for(lambda: llm.streams[0].closed)
+    finally:
+        runtime.shutdown()
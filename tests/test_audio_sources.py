@@ -0,0 +1,36 @@
+import threading
+import wave
+
+from audio_sources import AudioSource
+from benchmarks.offline import load_wav
+from benchmarks.standins import StandInLLM
+from engine import CHUNK_MS, FRAME_BYTES, PipelineEngine
+
+class BrokenSource(AudioSource):
+    realtime = False
+
+    def read(self):
+        raise OSError("device unplugged")
+
+def test_failed_reader_still_ends_the_source():
+    config = {'openai_api_key': 'offline', 'assemblyai_api_key': 'offline', 'response_cache': False,
+              'case_archive': '', 'vad_enabled': False}
+    engine = PipelineEngine(config, llm_client=StandInLLM(ttft=0.0), audio_source=BrokenSource())
+    ended = threading.Event()
+    engine.subscribe(lambda event, *args: ended.set() if event == 'source_ended' else None)
+    engine.start(stt=False)
+    try:
+        assert ended.wait(5.0)
+    finally:
+        engine.stop()
+
+def test_load_wav_converts_any_rate(tmp_path):
+    path = str(tmp_path / 'call.wav')
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(b'\x00\x01' * 2 * 8000)   # one second of stereo
+    frames = load_wav(path)
+    assert all(len(frame) == FRAME_BYTES for frame in frames)
+    assert abs(len(frames) - 1000 // CHUNK_MS) <= 1
@@ -0,0 +1,33 @@
+from cache import ResponseCache
+
+SYSTEM = {"role": "system", "content": "You are TJ, an Apple Support advisor."}
+
+def call(*turns):
+    messages = [SYSTEM]
+    for i, text in enumerate(turns):
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": text})
+    return messages
+
+def test_different_prior_turns_do_not_share_a_reply():
+    cache = ResponseCache(similarity=None)
+    icloud = call("My iCloud storage is full", "Would you like me to walk you through freeing up space?",
+                  "can you do that please")
+    billing = call("I was charged twice this month", "Would you like me to request a refund for the duplicate?",
+                   "can you do that please")
+    cache.put(icloud[-1]['content'], icloud, ["Sure, open Settings..."], 1.0)
+    assert cache.get(billing[-1]['content'], billing) is None
+    assert cache.get(icloud[-1]['content'], icloud) == ["Sure, open Settings..."]
+
+def test_same_point_in_another_call_hits():
+    cache = ResponseCache(similarity=None)
+    first = call("Hi", "Hello, may I have your name?", "I forgot my Apple ID password")
+    second = call("hi.", "Hello, may I have your name?", "I forgot my Apple ID password.")
+    cache.put(first[-1]['content'], first, ["Let's reset it."], 1.0)
+    assert cache.get(second[-1]['content'], second) == ["Let's reset it."]
+
+def test_short_turns_are_never_cached():
+    cache = ResponseCache(similarity=None)
+    messages = call("Is my backup on?", "Yes, it ran last night. Anything else?", "yes")
+    cache.put("yes", messages, ["Great."], 1.0)
+    assert cache.get("yes", messages) is None
+    assert not cache.entries
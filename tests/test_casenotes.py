@@ -0,0 +1,20 @@
+import os
+
+from casenotes import CaseNoteSink
+from output import Segment
+
+def feed(sink, reply, *lines):
+    for index, text in enumerate(lines):
+        sink.segment(Segment('call', reply, index, text, 'sentence', 0.0))
+    sink.reply_end('call', reply, " ".join(lines), False)
+
+def test_archive_is_created_with_the_first_note(tmp_path):
+    path = str(tmp_path / 'cases.db')
+    notes = []
+    sink = CaseNoteSink(path, on_note=notes.append)
+    feed(sink, 1, "Let's free up some space together.")
+    assert not os.path.exists(path)
+    feed(sink, 2, "Issue: iCloud storage full.", "Steps taken: Deleted old backups.", "Outcome: Resolved.")
+    assert os.path.exists(path)
+    assert len(notes) == 1
+    assert sink.archive.search("icloud")[0]['outcome'] == 'resolved'
@@ -0,0 +1,26 @@
+from history import MAX_PINNED, PIN_TOKEN_CAP, ConversationHistory, count_tokens
+
+def test_pins_in_the_window_count_against_the_cap():
+    history = ConversationHistory("system", budget=100000)
+    for i in range(MAX_PINNED + 4):
+        history.add('user', f"my email is customer{i}@icloud.com")
+        history.add('assistant', "Thanks.")
+    assert history.pin_count == MAX_PINNED
+    assert sum(1 for m, _ in history.entries if m.get('pinned')) == MAX_PINNED
+
+def test_pinned_text_is_clipped():
+    history = ConversationHistory("system", budget=200)
+    history.add('user', "My name is Jordan and " + "my iCloud storage keeps filling up again " * 40)
+    history.add('assistant', "I'm sorry to hear that.")
+    history.add('user', "It happened again today after the update " * 10)
+    assert history.pinned
+    assert count_tokens(history.pinned[0]) <= PIN_TOKEN_CAP
+
+def test_only_direct_requests_pin_the_answer():
+    history = ConversationHistory("system", budget=100000)
+    history.add('assistant', "Open Settings, tap your Apple ID, then iCloud. Is there anything else I can help you with?")
+    history.add('user', "no that was it")
+    assert not history.entries[-1][0].get('pinned')
+    history.add('assistant', "Hi there! May I have your first and last name, and the email address for your Apple ID?")
+    history.add('user', "sure it's Jordan Lee")
+    assert history.entries[-1][0].get('pinned')
@@ -0,0 +1,5 @@
+import llm
+
+def test_pooled_clients_build_with_the_installed_sdk():
+    assert llm.get_client('test-key', 'http://127.0.0.1:9/v1') is llm.get_client('test-key', 'http://127.0.0.1:9/v1')
+    assert llm.get_async_client('test-key', 'http://127.0.0.1:9/v1') is not None
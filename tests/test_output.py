@@ -0,0 +1,29 @@
+import time
+
+from output import OutputSink, OutputStage
+from tracing import Tracer
+
+class Collect(OutputSink):
+    def __init__(self):
+        self.segments = []
+
+    def segment(self, segment):
+        self.segments.append(segment.text)
+
+def test_restart_right_after_stop_keeps_sinks_alive():
+    stage = OutputStage(Tracer())
+    sink = Collect()
+    worker = stage.add_sink(sink)
+    stage.start()
+    stage.stop()
+    stage.start()
+    time.sleep(0.7)   # past the worker's poll, where a stopped thread would exit
+    stage.begin(None)
+    stage.push("Open Settings. ")
+    stage.end("Open Settings.")
+    deadline = time.monotonic() + 2.0
+    while not sink.segments and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert sink.segments == ["Open Settings."]
+    assert worker._thread is not None and worker._thread.is_alive()
+    stage.stop()
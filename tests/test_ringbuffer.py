@@ -0,0 +1,32 @@
+import threading
+import time
+
+from ringbuffer import BLOCK, DROP_OLDEST, AudioRingBuffer
+
+def test_block_write_that_fits_after_waiting_is_not_an_overrun():
+    buf = AudioRingBuffer(8, policy=BLOCK, block_timeout=2.0)
+    buf.write(b'\x00' * 8)
+
+    def drain():
+        time.sleep(0.05)
+        buf.peek()
+        buf.consume(8)
+
+    threading.Thread(target=drain).start()
+    assert buf.write(b'\x01' * 4) == 4
+    assert buf.overruns == 0
+    assert buf.dropped_bytes == 0
+
+def test_block_timeout_counts_an_overrun():
+    buf = AudioRingBuffer(8, policy=BLOCK, block_timeout=0.01)
+    buf.write(b'\x00' * 8)
+    assert buf.write(b'\x01' * 4) == 0
+    assert buf.overruns == 1
+    assert buf.dropped_bytes == 4
+
+def test_drop_oldest_counts_an_overrun():
+    buf = AudioRingBuffer(8, policy=DROP_OLDEST)
+    buf.write(b'\x00' * 8)
+    assert buf.write(b'\x01' * 4) == 4
+    assert buf.overruns == 1
+    assert buf.dropped_bytes == 4
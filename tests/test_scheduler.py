@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from scheduler import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LLMScheduler
+
+def make_scheduler(failures=2, retries=2):
+    breaker = CircuitBreaker(failures=failures, cooldown=0.0)
+    return LLMScheduler(rpm=0, tpm=0, retries=retries, retry_base=0.001, retry_max=0.001, breaker=breaker)
+
+def tokens(*items):
+    def start():
+        yield from items
+    return start
+
+def failing():
+    raise ConnectionError("upstream down")
+    yield
+
+def trip(scheduler):
+    scheduler.breaker.state = OPEN
+    scheduler.breaker.opened_at = 0.0
+
+def test_probe_closed_midway_does_not_stick_half_open():
+    scheduler = make_scheduler()
+    trip(scheduler)
+    stream = scheduler.stream('call', 10, tokens("a", "b", "c"))
+    assert next(stream) == "a"
+    assert scheduler.breaker.state == HALF_OPEN
+    stream.close()
+    assert scheduler.breaker.state == CLOSED
+    assert list(scheduler.stream('call', 10, tokens("d"))) == ["d"]
+
+def test_retries_record_one_failure_per_request():
+    scheduler = make_scheduler(failures=2, retries=2)
+    with pytest.raises(ConnectionError):
+        list(scheduler.stream('call', 10, failing))
+    assert scheduler.retried == 2
+    assert scheduler.breaker.consecutive == 1
+    assert scheduler.breaker.state == CLOSED
+
+def test_failed_probe_reopens_the_circuit():
+    scheduler = make_scheduler()
+    trip(scheduler)
+    with pytest.raises(ConnectionError):
+        list(scheduler.stream('call', 10, failing))
+    assert scheduler.breaker.state == OPEN
+    assert scheduler.breaker.consecutive == 1
+
+def test_cancelled_async_probe_does_not_stick_half_open():
+    scheduler = make_scheduler()
+    trip(scheduler)
+
+    def start():
+        async def gen():
+            await asyncio.sleep(10)
+            yield "never"
+        return gen()
+
+    async def consume():
+        async for _ in scheduler.astream('call', 10, start):
+            pass
+
+    async def main():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        assert scheduler.breaker.state == HALF_OPEN
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    assert scheduler.breaker.state == OPEN
+    assert list(scheduler.stream('call', 10, tokens("a"))) == ["a"]
+    assert scheduler.breaker.state == CLOSED
+
+def test_closed_stream_returns_its_unused_estimate():
+    scheduler = LLMScheduler(rpm=0, tpm=6000, retries=0)
+    full = scheduler.tokens.level
+    stream = scheduler.stream('call', 10, tokens("a", "b", "c"), max_tokens=50)
+    assert next(stream) == "a"
+    stream.close()
+    assert scheduler.tokens.level >= full - 11
+
+def test_failed_stream_returns_its_unused_estimate():
+    scheduler = LLMScheduler(rpm=0, tpm=6000, retries=1, retry_base=0.001, retry_max=0.001)
+    full = scheduler.tokens.level
+    with pytest.raises(ConnectionError):
+        list(scheduler.stream('call', 10, failing, max_tokens=50))
+    assert scheduler.tokens.level >= full - 20
+
+def test_idle_sessions_are_pruned_from_usage():
+    scheduler = make_scheduler()
+    scheduler.usage['ended-call'] = (100.0, 0.0)
+    scheduler._pruned = 0.0
+    list(scheduler.stream('live-call', 10, tokens("a")))
+    assert 'ended-call' not in scheduler.usage
+    assert 'live-call' in scheduler.usage
@@ -0,0 +1,16 @@
+from speculative import Speculation
+
+def test_closing_a_claimed_stream_cancels_generation():
+    spec = Speculation("my icloud is full", [{"role": "user", "content": "my icloud is full"}])
+    spec.push("Let's ")
+    stream = spec.stream()
+    assert next(stream) == "Let's "
+    stream.close()
+    assert spec.cancelled.is_set()
+
+def test_finished_stream_is_not_cancelled():
+    spec = Speculation("hello", [{"role": "user", "content": "hello"}])
+    spec.push("Hi")
+    spec.finish()
+    assert list(spec.stream()) == ["Hi"]
+    assert not spec.cancelled.is_set()
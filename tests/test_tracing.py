@@ -0,0 +1,17 @@
+import time
+
+from tracing import Tracer
+
+def test_hangover_sends_do_not_move_audio_sent():
+    tracer = Tracer()
+    tracer.voice()
+    tracer.audio_sent()
+    trace = tracer.current
+    spoken = trace.marks['audio_sent']
+    time.sleep(0.01)
+    tracer.audio_sent()   # hangover / keepalive frames after the last word
+    tracer.audio_sent()
+    assert trace.marks['audio_sent'] == spoken
+    tracer.voice()
+    tracer.audio_sent()
+    assert trace.marks['audio_sent'] > spoken
@@ -0,0 +1,233 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# ------------ TURN TRACING ------------
+# Every customer turn gets a trace ID and time.monotonic() marks as it moves
+# through the pipeline. The gaps between marks feed rolling per-stage windows,
+# which give the p50/p95/p99 shown in the stats panel and exported as JSON
+# lines or Prometheus text.
+POINTS = ('voice_start', 'audio_sent', 'end_of_turn', 'llm_request', 'first_token', 'first_sentence', 'last_token',
+          'first_render')
+STAGES = (
+    # name, from, to
+    ('speech', 'voice_start', 'audio_sent'),
+    ('stt', 'audio_sent', 'end_of_turn'),
+    ('queue', 'end_of_turn', 'llm_request'),
+    ('ttft', 'llm_request', 'first_token'),
+    ('generation', 'first_token', 'last_token'),
+    ('sentence', 'llm_request', 'first_sentence'),   # first complete sentence handed to the output sinks
+    ('render', 'first_token', 'first_render'),
+    ('response', 'end_of_turn', 'first_render'),
+    ('e2e', 'audio_sent', 'first_render'),
+)
+QUANTILES = (0.5, 0.95, 0.99)
+TRACE_WINDOW = 1000
+METRICS_WRITE_INTERVAL = 5.0
+MAX_AWAITING_RENDER = 8
+
+_trace_ids = itertools.count(1)
+
+class TurnTrace:
+    __slots__ = ('trace_id', 'session_id', 'marks', 'finished', 'glitches')
+
+    def __init__(self, session_id=None):
+        self.trace_id = f"{os.getpid():x}-{next(_trace_ids):06d}"
+        self.session_id = session_id
+        self.marks = {}
+        self.finished = False
+        self.glitches = None  # capture glitches while the turn was spoken, by kind
+
+    def mark(self, point, at=None):
+        self.marks[point] = time.monotonic() if at is None else at
+
+    def stages(self):
+        marks = self.marks
+        return {name: marks[end] - marks[start] for name, start, end in STAGES
+                if start in marks and end in marks and marks[end] >= marks[start]}
+
+    def to_dict(self):
+        origin = min(self.marks.values()) if self.marks else 0.0
+        record = {
+            'trace_id': self.trace_id,
+            'session_id': self.session_id,
+            'marks': {k: round(v - origin, 6) for k, v in self.marks.items()},
+            'stages': {k: round(v, 6) for k, v in self.stages().items()},
+        }
+        if self.glitches:
+            record['glitches'] = dict(self.glitches)
+        return record
+
+class RollingWindow:
+    def __init__(self, size=TRACE_WINDOW):
+        self.values = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self, qs=QUANTILES):
+        return quantiles(self.values, qs)
+
+def quantiles(values, qs=QUANTILES):
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    last = len(ordered) - 1
+    return {q: ordered[min(last, int(round(q * last)))] for q in qs}
+
+def format_quantiles(qs):
+    # "p50 / p95 / p99" as the stats panel shows it
+    if not qs:
+        return '-'
+    return " / ".join(f"{qs[q]:.2f}" for q in QUANTILES) + "s"
+
+class Tracer:
+    # One per engine. The capture, sender, STT and LLM threads each touch only
+    # their own mark; hand-offs between traces are under the lock.
+    def __init__(self, session_id=None, window=TRACE_WINDOW, trace_file=None, metrics_file=None):
+        self.session_id = session_id
+        self.window = window
+        self.trace_file = trace_file
+        self.metrics_file = metrics_file
+        self.expect_render = False  # set by a UI that calls rendered()
+        self.current = None         # trace collecting audio for the turn being spoken
+        self.voice_unsent = False   # a voiced frame was captured since the last send
+        self.awaiting_render = deque()
+        self.stages = {name: RollingWindow(window) for name, _, _ in STAGES}
+        self.completed = deque(maxlen=window)
+        self.listeners = []
+        self._metrics_written = 0.0
+        self._lock = threading.Lock()
+
+    # ---- capture and STT side ----
+    def voice(self):
+        # First voiced frame opens the trace for the next turn
+        if self.current is None:
+            with self._lock:
+                if self.current is None:
+                    self.current = TurnTrace(self.session_id)
+                    self.current.mark('voice_start')
+        self.voice_unsent = True
+
+    def glitch(self, kind):
+        # Capture overflow or late buffer; tagged on the turn being spoken so a
+        # bad transcript can be tied back to dropped audio
+        trace = self.current
+        if trace is not None:
+            if trace.glitches is None:
+                trace.glitches = {}
+            trace.glitches[kind] = trace.glitches.get(kind, 0) + 1
+
+    def audio_sent(self):
+        # Only a send carrying speech moves the mark: VAD hangover and keepalive
+        # frames sent after the last word would start the STT timer late
+        trace = self.current
+        if trace is not None and self.voice_unsent:
+            self.voice_unsent = False
+            trace.mark('audio_sent')
+
+    def end_of_turn(self):
+        # Closes the trace collecting audio (or starts one for typed turns) and returns it
+        with self._lock:
+            trace, self.current = self.current, None
+        if trace is None:
+            trace = TurnTrace(self.session_id)
+        trace.mark('end_of_turn')
+        return trace
+
+    # ---- LLM side ----
+    def request(self, trace):
+        if trace is None:
+            trace = TurnTrace(self.session_id)
+            trace.mark('end_of_turn')
+        trace.mark('llm_request')
+        return trace
+
+    def first_token(self, trace):
+        trace.mark('first_token')
+        if self.expect_render:
+            stale = []
+            with self._lock:
+                self.awaiting_render.append(trace)
+                while len(self.awaiting_render) > MAX_AWAITING_RENDER:
+                    stale.append(self.awaiting_render.popleft())
+            for old in stale:
+                if old.finished:
+                    self._complete(old)
+
+    def first_sentence(self, trace):
+        trace.mark('first_sentence')
+
+    def finish(self, trace):
+        if trace.finished:
+            return
+        if 'first_token' in trace.marks:
+            trace.mark('last_token')
+        with self._lock:
+            trace.finished = True
+            done = 'first_render' in trace.marks or trace not in self.awaiting_render
+        if done:
+            self._complete(trace)
+
+    # ---- UI side ----
+    def rendered(self):
+        # The UI drew the first token of the oldest turn still waiting for it
+        with self._lock:
+            if not self.awaiting_render:
+                return
+            trace = self.awaiting_render.popleft()
+        trace.mark('first_render')
+        if trace.finished:
+            self._complete(trace)
+
+    # ---- results ----
+    def _complete(self, trace):
+        stages = trace.stages()
+        for name, value in stages.items():
+            self.stages[name].add(value)
+        self.completed.append(trace)
+        if self.trace_file:
+            with open(self.trace_file, 'a', encoding='utf-8') as fh:
+                fh.write(json.dumps(trace.to_dict()) + '\n')
+        if self.metrics_file and time.monotonic() - self._metrics_written >= METRICS_WRITE_INTERVAL:
+            self._metrics_written = time.monotonic()
+            write_prometheus(self.metrics_file, [self])
+        for callback in list(self.listeners):
+            callback(trace, stages)
+
+    def summary(self):
+        return {name: window.quantiles() for name, window in self.stages.items() if window.values}
+
+    def write_jsonl(self, fh):
+        for trace in list(self.completed):
+            fh.write(json.dumps(trace.to_dict()) + '\n')
+
+# ------------ PROMETHEUS EXPORT ------------
+def prometheus_text(tracers):
+    # Summary metrics over the rolling windows of one or more tracers
+    lines = [
+        "# HELP support_turn_stage_seconds Per-turn pipeline stage latency over the rolling window.",
+        "# TYPE support_turn_stage_seconds summary",
+    ]
+    for name, _, _ in STAGES:
+        windows = [t.stages[name] for t in tracers]
+        values = [v for w in windows for v in w.values]
+        for q, value in quantiles(values).items():
+            lines.append(f'support_turn_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'support_turn_stage_seconds_sum{{stage="{name}"}} {sum(w.total for w in windows):.6f}')
+        lines.append(f'support_turn_stage_seconds_count{{stage="{name}"}} {sum(w.count for w in windows)}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path, tracers):
+    # Atomic replace, for node_exporter's textfile collector
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        fh.write(prometheus_text(tracers))
+    os.replace(tmp, path)
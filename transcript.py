@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+import time
+from array import array
+
+# ------------ TRANSCRIPT STORE ------------
+# Append-only JSONL file with one line per completed turn, plus an in-memory
+# array of line offsets so any range of turns can be read back with a single
+# seek. The chat window only keeps recent turns; this is the full record that
+# copy/export and scroll-back page from.
+class TranscriptStore:
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array('q')  # byte offset of each turn
+        self.size = 0
+        self._fh = None
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._index()
+
+    def _index(self):
+        # Rebuild offsets when reopening an existing transcript
+        with open(self.path, 'rb') as fh:
+            offset = 0
+            for line in fh:
+                if line.endswith(b'\n'):
+                    self.offsets.append(offset)
+                    offset += len(line)
+        self.size = offset
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, role, text, ts=None):
+        # Returns the new turn's index; the file is created on the first turn
+        line = json.dumps({'ts': round(ts or time.time(), 3), 'role': role, 'text': text}, ensure_ascii=False)
+        data = (line + '\n').encode('utf-8')
+        with self._lock:
+            if self._fh is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._fh = open(self.path, 'ab')
+                self._fh.truncate(self.size)  # drop a torn last line from a crash
+            self._fh.write(data)
+            self._fh.flush()
+            self.offsets.append(self.size)
+            self.size += len(data)
+            return len(self.offsets) - 1
+
+    def read(self, start, stop=None):
+        # Turns [start, stop) as dicts
+        with self._lock:
+            stop = len(self.offsets) if stop is None else min(stop, len(self.offsets))
+            if start >= stop:
+                return []
+            begin = self.offsets[start]
+            end = self.offsets[stop] if stop < len(self.offsets) else self.size
+        with open(self.path, 'rb') as fh:
+            fh.seek(begin)
+            data = fh.read(end - begin)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def iter_text(self, start=0, page=200):
+        # Streams rendered turns a page at a time instead of loading the whole call
+        for first in range(start, len(self), page):
+            for record in self.read(first, first + page):
+                yield record['text'] + '\n\n'
+
+    def export(self, fh, start=0):
+        for text in self.iter_text(start):
+            fh.write(text)
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+def new_transcript_path(directory):
+    return os.path.join(directory, time.strftime('transcript-%Y%m%d-%H%M%S.jsonl'))
@@ -0,0 +1,89 @@
+from collections import deque
+
+import numpy as np
+
+# ------------ VOICE ACTIVITY DETECTION ------------
+# Energy-based gate run on each int16 frame before it is queued for the STT
+# socket. The noise floor adapts to the room, so steady background noise is
+# suppressed while speech is passed through with pre-roll and hangover padding.
+#
+# Hangover has to cover AssemblyAI's end-of-turn silence (max_turn_silence is
+# 1280ms by default), otherwise the server never hears the pause that closes a turn.
+VAD_HANGOVER_MS = 1300
+VAD_PREROLL_MS = 200
+VAD_KEEPALIVE_MS = 1000
+
+class VoiceActivityDetector:
+    def __init__(self, chunk_ms=50, threshold_ratio=3.0, min_rms=150.0,
+                 hangover_ms=VAD_HANGOVER_MS, preroll_ms=VAD_PREROLL_MS,
+                 keepalive_ms=VAD_KEEPALIVE_MS, noise_alpha=0.05):
+        self.chunk_ms = chunk_ms
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.noise_alpha = noise_alpha
+        self.hangover_frames = max(0, int(round(hangover_ms / chunk_ms)))
+        self.keepalive_frames = max(1, int(round(keepalive_ms / chunk_ms))) if keepalive_ms else 0
+        self.preroll = deque(maxlen=max(0, int(round(preroll_ms / chunk_ms))))
+        self._work = np.zeros(0, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = self.min_rms / self.threshold_ratio
+        self.hangover = 0
+        self.since_sent = 0
+        self.preroll.clear()
+        self.voiced = False  # whether the last input frame was speech
+        self.frames_in = 0
+        self.frames_suppressed = 0
+        self.keepalives = 0
+
+    @property
+    def suppressed_ratio(self):
+        return self.frames_suppressed / self.frames_in if self.frames_in else 0.0
+
+    def rms(self, frame):
+        samples = np.frombuffer(frame, dtype='<i2')
+        if len(self._work) < len(samples):
+            self._work = np.empty(len(samples), dtype=np.float32)
+        work = self._work[:len(samples)]
+        np.copyto(work, samples, casting='unsafe')
+        return float(np.sqrt(np.dot(work, work) / len(samples))) if len(samples) else 0.0
+
+    def is_speech(self, level):
+        return level > max(self.min_rms, self.noise_floor * self.threshold_ratio)
+
+    def process(self, frame):
+        # Returns the list of frames to send for this input frame (possibly empty)
+        self.frames_in += 1
+        level = self.rms(frame)
+
+        self.voiced = self.is_speech(level)
+        if self.voiced:
+            out = list(self.preroll)
+            # Pre-roll frames were held back, not dropped
+            self.frames_suppressed -= len(out)
+            self.preroll.clear()
+            out.append(frame)
+            self.hangover = self.hangover_frames
+            self.since_sent = 0
+            return out
+
+        # Only learn the noise floor from non-speech frames
+        self.noise_floor += self.noise_alpha * (level - self.noise_floor)
+
+        if self.hangover > 0:
+            self.hangover -= 1
+            self.since_sent = 0
+            return [frame]
+
+        self.since_sent += 1
+        if self.keepalive_frames and self.since_sent >= self.keepalive_frames:
+            # A short keepalive stops the STT session from timing out during long silences
+            self.since_sent = 0
+            self.keepalives += 1
+            return [frame]
+
+        self.frames_suppressed += 1
+        if self.preroll.maxlen:
+            self.preroll.append(frame)
+        return []